@@ -1,38 +1,72 @@
+import concurrent.futures
+import json
 import os
-import requests
+import random
+import statistics
+import time
 import uuid
-from flask import Flask, render_template, request, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from collections import Counter
 
-class Base(DeclarativeBase):
-    pass
+import click
+from flask import Blueprint, Flask, Response, render_template, request, jsonify, session, stream_with_context, url_for
 
-db = SQLAlchemy(model_class=Base)
+import database
+import models
+import scoring_pool
+import tmdb
+from candidate_sources import SIMILAR_PARAMS, build_candidate_sources, gather_candidates, iter_candidates
+from database import use_replica
+from extensions import db
+from genres import genre_objects, seed_genres
+from importer import (
+    TARGETS as IMPORT_TARGETS, CSVImportError, import_job_status, import_movies, parse_import_csv, resolve_rows,
+    start_import_job
+)
+from scoring import build_profile
+from seen_set import load_seen_set, mark_seen
+from slates import SLATE_SIZE, load_slate, pick_from_slate, profile_version, save_slate, slates_to_refresh
+from tmdb import TMDB_API_KEY, TMDBError, TMDBUnavailable
+from write_buffer import write_buffer
 
-# create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key")
+bp = Blueprint('main', __name__)
 
-# configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+def create_app():
+    """Application factory
 
-# initialize the app with the extension
-db.init_app(app)
+    Schema changes are not applied here so worker boot issues no DDL;
+    run `flask --app main init-db` once per deploy instead.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key")
+    
+    # configure the primary database, its pool and the optional read replica
+    database.configure(app)
+    
+    # initialize the app with the extension
+    db.init_app(app)
+    
+    # Recommendation and feedback writes are flushed in batches off the request path
+    write_buffer.init_app(app, db)
+    
+    app.register_blueprint(bp)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_genres_command)
+    app.cli.add_command(import_csv_command)
+    app.cli.add_command(refresh_slates_command)
+    
+    return app
 
-with app.app_context():
-    # Import models after db is initialized
-    import models
+@click.command('init-db')
+def init_db_command():
+    """Create any missing database tables and seed genres"""
     db.create_all()
+    click.echo('Database tables created.')
+    click.echo(f'Seeded {seed_genres()} genres.')
 
-# TMDB API configuration
-TMDB_API_KEY = os.environ.get("TMDB_API_KEY", "a4747b23774690ec1831568f642ff364")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+@click.command('seed-genres')
+def seed_genres_command():
+    """Refresh the Genre table from TMDB"""
+    click.echo(f'Seeded {seed_genres()} genres.')
 
 def get_or_create_user():
     """Get or create a user based on session"""
@@ -49,9 +83,6 @@ def get_or_create_user():
 
 def analyze_user_preferences(user_movies):
     """Analyze user movie preferences to understand their taste"""
-    from collections import Counter
-    import statistics
-    
     # Extract all genres and count frequency
     all_genres = []
     ratings = []
@@ -97,92 +128,6 @@ def analyze_user_preferences(user_movies):
         'preferred_year_range': (era_start, era_end)
     }
 
-def get_cached_tone_analysis(movie_id, title, overview, genres):
-    """Fast tonal analysis using cached patterns and genre inference"""
-    # Skip API calls for speed - use overview and genre-based inference
-    tone_scores = {}
-    
-    # Quick tone inference from overview text
-    overview_lower = (overview or '').lower()
-    title_lower = (title or '').lower()
-    
-    tone_patterns = {
-        'dark': ['dark', 'brutal', 'violent', 'murder', 'death', 'crime', 'war', 'horror'],
-        'uplifting': ['hope', 'inspiring', 'triumph', 'success', 'love', 'family', 'friendship'],
-        'thrilling': ['action', 'chase', 'escape', 'fight', 'mission', 'adventure', 'suspense'],
-        'comedic': ['funny', 'comedy', 'laugh', 'humor', 'hilarious', 'romantic comedy'],
-        'dramatic': ['emotional', 'drama', 'life', 'story', 'relationship', 'struggle'],
-        'romantic': ['love', 'romance', 'relationship', 'wedding', 'couple', 'heart']
-    }
-    
-    # Genre-based tone mapping (fast lookup)
-    genre_tones = {
-        28: 'thrilling',    # Action
-        35: 'comedic',      # Comedy
-        80: 'dark',         # Crime
-        18: 'dramatic',     # Drama
-        27: 'dark',         # Horror
-        10749: 'romantic',  # Romance
-        53: 'thrilling',    # Thriller
-        10752: 'dramatic'   # War
-    }
-    
-    # Score based on genres (fast)
-    for genre_id in genres:
-        if genre_id in genre_tones:
-            tone = genre_tones[genre_id]
-            tone_scores[tone] = tone_scores.get(tone, 0) + 2
-    
-    # Quick text analysis (limited to avoid slowdown)
-    for tone, patterns in tone_patterns.items():
-        for pattern in patterns[:3]:  # Only check top 3 patterns per tone
-            if pattern in overview_lower or pattern in title_lower:
-                tone_scores[tone] = tone_scores.get(tone, 0) + 1
-                break  # Stop after first match per tone
-    
-    return tone_scores
-
-def infer_user_tone_profile(user_movies):
-    """Fast inference of user's tonal preferences using genre patterns"""
-    user_tone_profile = {}
-    
-    # Fast genre-based tone mapping
-    genre_tone_map = {
-        28: 'thrilling',    # Action
-        35: 'comedic',      # Comedy  
-        80: 'dark',         # Crime
-        18: 'dramatic',     # Drama
-        27: 'dark',         # Horror
-        10749: 'romantic',  # Romance
-        53: 'thrilling',    # Thriller
-        10752: 'dramatic',  # War
-        36: 'dramatic',     # History
-        878: 'thrilling',   # Sci-Fi
-        14: 'dark',         # Fantasy (often dark themes)
-        9648: 'dark'        # Mystery
-    }
-    
-    # Analyze user movies quickly
-    for movie in user_movies:
-        movie_genres = movie.get('genre_ids', [])
-        
-        # Quick tone scoring based on genres only
-        for genre_id in movie_genres:
-            if genre_id in genre_tone_map:
-                tone = genre_tone_map[genre_id]
-                user_tone_profile[tone] = user_tone_profile.get(tone, 0) + 1
-        
-        # Bonus for genre combinations (no API calls)
-        genre_set = set(movie_genres)
-        if 18 in genre_set and 36 in genre_set:  # Drama + History
-            user_tone_profile['uplifting'] = user_tone_profile.get('uplifting', 0) + 1
-        if 28 in genre_set and 53 in genre_set:  # Action + Thriller
-            user_tone_profile['thrilling'] = user_tone_profile.get('thrilling', 0) + 1
-        if 80 in genre_set and 53 in genre_set:  # Crime + Thriller
-            user_tone_profile['dark'] = user_tone_profile.get('dark', 0) + 2
-    
-    return user_tone_profile
-
 def get_collaborative_candidates(user_movies):
     """Fast collaborative filtering using only highest-rated user movie"""
     similar_movie_ids = set()
@@ -191,21 +136,21 @@ def get_collaborative_candidates(user_movies):
     best_movie = max(user_movies, key=lambda m: m.get('vote_average', 0))
     
     try:
-        response = requests.get(
-            f"{TMDB_BASE_URL}/movie/{best_movie['id']}/similar",
-            params={'api_key': TMDB_API_KEY, 'page': 1},
+        # Same params as the similar candidate source, so one of the two is a cache hit
+        similar_movies = tmdb.get(
+            f"/movie/{best_movie['id']}/similar",
+            SIMILAR_PARAMS,
             timeout=1.5  # Faster timeout
-        )
-        if response.ok:
-            similar_movies = response.json().get('results', [])
-            for sim_movie in similar_movies[:15]:  # Get more from single call
-                similar_movie_ids.add(sim_movie['id'])
-    except:
-        pass  # Continue without collaborative filtering if it fails
+        ).get('results', [])
+        for sim_movie in similar_movies[:15]:  # Get more from single call
+            similar_movie_ids.add(sim_movie['id'])
+    except (TMDBError, TMDBUnavailable) as e:
+        # Continue without collaborative filtering if it fails
+        print(f"Collaborative filtering request failed: {e}")
     
     return similar_movie_ids
 
-def recommend_movie(user_movies, candidates, feedback):
+def recommend_movie(user_movies, candidates, feedback, k=5):
     """
     Advanced movie recommendation using comprehensive weighted scoring system
     
@@ -215,113 +160,13 @@ def recommend_movie(user_movies, candidates, feedback):
         feedback: List of recent feedback entries with genres and liked boolean
     
     Returns:
-        List of top 5 candidates sorted by score
+        List of top k candidates sorted by score
     """
-    import math
-    
-    # 1. Enhanced Genre Matching - frequency vector with 10 points per match
-    genre_frequency = {}
-    for movie in user_movies:
-        for genre_id in movie.get('genre_ids', []):
-            genre_frequency[genre_id] = genre_frequency.get(genre_id, 0) + 1
-    
-    # 2. User Feedback Learning
-    liked_genres = set()
-    disliked_genres = set()
-    
-    for entry in feedback:
-        if entry.get('genres') and entry.get('liked') is not None:
-            genre_ids = [g['id'] for g in entry['genres'] if isinstance(g, dict) and 'id' in g]
-            if entry['liked']:
-                liked_genres.update(genre_ids)
-            else:
-                disliked_genres.update(genre_ids)
-    
-    # Liked genres override disliked
-    disliked_genres = disliked_genres - liked_genres
-    
-    # 3. Collaborative Filtering Approximation
+    # Collaborative filtering needs TMDB, so it runs here rather than in the scoring workers
     collaborative_candidates = get_collaborative_candidates(user_movies)
     
-    # 4. Emotional/Tonal Matching
-    user_tone_profile = infer_user_tone_profile(user_movies)
-    
-    # 5. Score each candidate
-    scored_candidates = []
-    
-    for candidate in candidates:
-        # Content Safety Filter
-        if (candidate.get('adult', False) or 
-            any(word in candidate.get('title', '').lower() for word in ['porn', 'xxx', 'hardcore'])):
-            continue
-        
-        score = 0
-        candidate_genres = set(candidate.get('genre_ids', []))
-        
-        # Enhanced Genre Matching (10 points per match, weighted by frequency)
-        for genre_id in candidate_genres:
-            if genre_id in genre_frequency:
-                score += 10 * genre_frequency[genre_id]
-        
-        # User Feedback Learning (+12/-8 per genre)
-        for genre_id in candidate_genres:
-            if genre_id in liked_genres:
-                score += 12
-            elif genre_id in disliked_genres:
-                score -= 8
-        
-        # Enhanced Rating Quality
-        rating = candidate.get('vote_average', 0)
-        vote_count = candidate.get('vote_count', 0)
-        
-        if rating >= 8.0:
-            score += 10
-        elif rating >= 7.5:
-            score += 6
-        elif rating >= 7.0:
-            score += 2
-        elif rating < 6.0:
-            score -= 10
-        
-        # Social proof bonus
-        if vote_count >= 1000:
-            score += 2
-        
-        # Alternative: vote_average * log(vote_count + 1) bonus
-        if vote_count > 0:
-            score += min(5, rating * math.log(vote_count + 1) / 10)  # Capped at 5 points
-        
-        # Enhanced Popularity Decay
-        popularity = candidate.get('popularity', 0)
-        if 20 <= popularity <= 150:
-            score += 8
-        elif popularity > 300:
-            score -= 2
-        elif popularity < 10 and score < 20:  # Deprioritize low popularity unless strong score
-            score *= 0.8
-        
-        # Collaborative Filtering Bonus
-        if candidate.get('id') in collaborative_candidates:
-            score += 10
-        
-        # Fast Emotional/Tonal Matching (no API calls)
-        candidate_tone_scores = get_cached_tone_analysis(
-            candidate.get('id', 0),
-            candidate.get('title', ''),
-            candidate.get('overview', ''),
-            candidate_genres
-        )
-        
-        for tone, user_strength in user_tone_profile.items():
-            if user_strength > 0 and tone in candidate_tone_scores:
-                tone_bonus = min(10, candidate_tone_scores[tone] * 3 * (user_strength / len(user_movies)))
-                score += tone_bonus
-        
-        scored_candidates.append((candidate, max(0, score)))
-    
-    # Sort by score and return top 5
-    scored_candidates.sort(key=lambda x: x[1], reverse=True)
-    return [movie for movie, score in scored_candidates[:5]]
+    profile = build_profile(user_movies, feedback, collaborative_candidates)
+    return scoring_pool.rank(profile, candidates, k=k)
 
 def calculate_similarity_score(candidate, user_analysis, user):
     """Fast similarity scoring for candidate movies - kept for backward compatibility"""
@@ -375,28 +220,6 @@ def calculate_similarity_score(candidate, user_analysis, user):
     
     return max(0, score)
 
-def is_adult_content(movie):
-    """Check if movie contains explicitly pornographic content"""
-    # Only filter out explicitly pornographic content, not general adult themes
-    pornographic_keywords = [
-        'porn', 'xxx', 'hardcore', 'explicit', 'pornographic', 'adult film',
-        'sex tape', 'erotic film', 'blue movie', 'stag film'
-    ]
-    
-    title = movie.get('title', '').lower()
-    overview = movie.get('overview', '').lower()
-    
-    # Check for explicitly pornographic keywords
-    for keyword in pornographic_keywords:
-        if keyword in title or keyword in overview:
-            return True
-    
-    # Check if title contains obvious adult film patterns
-    if any(pattern in title for pattern in [' xxx ', 'adult ', 'porn ']):
-        return True
-    
-    return False
-
 def get_user_genre_preferences(user):
     """Fast user genre preference lookup with caching"""
     liked_genres = set()
@@ -427,17 +250,104 @@ def get_user_genre_preferences(user):
         'disliked_genres': disliked_genres
     }
 
-@app.route('/')
+@click.command('import-csv')
+@click.argument('csv_file', type=click.File(encoding='utf-8-sig'))
+@click.option('--session-id', required=True, help='User session id to import into')
+@click.option('--target', type=click.Choice(sorted(IMPORT_TARGETS)), default='favorites')
+def import_csv_command(csv_file, session_id, target):
+    """Bulk import a CSV or Letterboxd export for a user"""
+    try:
+        rows = parse_import_csv(csv_file.read())
+    except CSVImportError as e:
+        raise click.ClickException(str(e))
+    
+    user = models.User.query.filter_by(session_id=session_id).first()
+    if not user:
+        user = models.User(session_id=session_id)
+        db.session.add(user)
+        db.session.commit()
+    
+    with click.progressbar(length=len(rows), label='Resolving titles') as bar:
+        def progress(done, total):
+            bar.length = total
+            bar.update(done - bar.pos)
+        try:
+            resolved = resolve_rows(rows, progress)
+        except TMDBUnavailable as e:
+            raise click.ClickException(f'{e}; nothing was imported, try again in {e.retry_after}s')
+    
+    result = import_movies(user, resolved, target)
+    click.echo(f"Imported {result['imported']}, skipped {result['skipped']} already present, "
+               f"{len(result['unresolved'])} not found, {len(result['failed'])} failed (TMDB unavailable).")
+    for title in result['unresolved']:
+        click.echo(f'  not found: {title}')
+    for title in result['failed']:
+        click.echo(f'  failed, re-run to retry: {title}')
+
+def refresh_slate(user, user_movies):
+    """Rank a fresh slate for a user offline, without a latency budget"""
+    user_analysis = analyze_user_preferences(user_movies)
+    if not user_analysis['genres']:
+        return 0
+    
+    feedback_data = get_recent_feedback(user)
+    seen_set = load_seen_set(user.id)
+    accept = make_candidate_filter(user_movies, [], seen_set)
+    
+    sources = build_candidate_sources(user_movies, user_analysis, user.id, timeout=tmdb.TMDB_TIMEOUT)
+    candidates = gather_candidates(sources, accept, target=SLATE_SIZE * 4, budget=tmdb.TMDB_TIMEOUT * 3)
+    if not candidates:
+        return 0
+    
+    ranked = recommend_movie(user_movies, candidates, feedback_data, k=SLATE_SIZE)
+    save_slate(user.id, profile_version(user_movies, feedback_data), user_movies, ranked)
+    return len(ranked)
+
+def refresh_slates(limit=None):
+    """Recompute slates for recently active users; returns how many were refreshed"""
+    refreshed = 0
+    for slate in slates_to_refresh(limit):
+        try:
+            if refresh_slate(slate.user, slate.movies):
+                refreshed += 1
+        except (TMDBError, TMDBUnavailable) as e:
+            print(f"Slate refresh for user {slate.user_id} failed: {e}")
+    write_buffer.flush()
+    return refreshed
+
+@click.command('refresh-slates')
+@click.option('--interval', type=float, default=0, help='Keep running, refreshing every N seconds')
+@click.option('--limit', type=int, default=None, help='Most slates to refresh per run')
+def refresh_slates_command(interval, limit):
+    """Precompute recommendation slates for recently active users"""
+    while True:
+        started = time.monotonic()
+        click.echo(f'Refreshed {refresh_slates(limit)} slates in {time.monotonic() - started:.1f}s.')
+        # Release the session between runs so the next one sees new feedback
+        db.session.remove()
+        if not interval:
+            break
+        time.sleep(interval)
+
+@bp.app_errorhandler(TMDBUnavailable)
+def tmdb_unavailable(e):
+    """Shed load quickly while TMDB is down or saturated"""
+    response = jsonify({'error': 'Movie service is temporarily unavailable, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@bp.route('/')
 def index():
     # Check if API key is configured
     has_api_key = bool(TMDB_API_KEY)
     return render_template('index.html', has_api_key=has_api_key)
 
-@app.route('/watchlist')
+@bp.route('/watchlist')
 def watchlist_page():
     return render_template('watchlist.html')
 
-@app.route('/api/search-movie', methods=['POST'])
+@bp.route('/api/search-movie', methods=['POST'])
 def search_movie():
     if not TMDB_API_KEY:
         return jsonify({'error': 'TMDB API key not configured'}), 500
@@ -449,21 +359,10 @@ def search_movie():
         return jsonify({'error': 'Movie title is required'}), 400
     
     try:
-        response = requests.get(
-            f"{TMDB_BASE_URL}/search/movie",
-            params={
-                'api_key': TMDB_API_KEY,
-                'query': title,
-                'include_adult': False
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 401:
-            return jsonify({'error': 'Invalid TMDB API key'}), 401
-        
-        response.raise_for_status()
-        data = response.json()
+        data = tmdb.get('/search/movie', {
+            'query': title,
+            'include_adult': False
+        })
         
         if data.get('results'):
             movie = data['results'][0]
@@ -495,10 +394,76 @@ def search_movie():
         else:
             return jsonify({'error': f'Movie "{title}" not found'}), 404
             
-    except requests.exceptions.RequestException as e:
+    except TMDBError as e:
+        if e.status_code == 401:
+            return jsonify({'error': 'Invalid TMDB API key'}), 401
         return jsonify({'error': f'Failed to search for movie: {str(e)}'}), 500
 
-@app.route('/api/get-recommendation', methods=['POST'])
+def make_candidate_filter(user_movies, excluded_ids, seen_set):
+    """Build the accept() callback used while pooling candidates
+    
+    Excludes the input movies, anything the client asks to skip and
+    everything this user has already been shown. Adult content is dropped
+    by the candidate scheduler before candidates reach it.
+    """
+    seen_ids = set(excluded_ids)
+    seen_ids.update(movie['id'] for movie in user_movies if movie.get('id'))
+    
+    def accept(movie, record=True):
+        movie_id = movie.get('id')
+        if (movie_id and movie_id not in seen_ids and
+            movie_id not in seen_set and
+            (movie.get('vote_average') or 0) >= 6.0 and
+            movie.get('poster_path') and
+            movie.get('overview') and
+            len(movie.get('overview', '')) > 20):
+            if record:
+                seen_ids.add(movie_id)
+            return True
+        return False
+    
+    return accept
+
+def get_recent_feedback(user):
+    """Recent liked/disliked recommendations in the shape recommend_movie expects"""
+    # Feedback a moment behind is fine for scoring, so this can read from the replica
+    user_id = user.id
+    with use_replica():
+        recent_feedback = models.Recommendation.query.filter_by(
+            user_id=user_id
+        ).filter(
+            models.Recommendation.was_liked.isnot(None)
+        ).order_by(
+            models.Recommendation.recommended_at.desc()
+        ).limit(20).all()
+    
+    feedback_data = []
+    for rec in recent_feedback:
+        if rec.genres:
+            feedback_data.append({
+                'genres': rec.genres,
+                'liked': rec.was_liked
+            })
+    return feedback_data
+
+def save_recommendation(user, seen_set, recommendation):
+    """Mark a recommendation as seen and queue it for the batched writer"""
+    # Never show this movie to the user again
+    mark_seen(user.id, seen_set, recommendation['id'])
+    
+    write_buffer.add_recommendation(
+        user_id=user.id,
+        tmdb_id=recommendation['id'],
+        title=recommendation.get('title', ''),
+        release_date=recommendation.get('release_date', ''),
+        poster_path=recommendation.get('poster_path', ''),
+        overview=recommendation.get('overview', ''),
+        vote_average=recommendation.get('vote_average', 0),
+        # Genre names come from the in-process registry, not another TMDB call
+        genres=genre_objects(recommendation.get('genre_ids', []))
+    )
+
+@bp.route('/api/get-recommendation', methods=['POST'])
 def get_recommendation():
     if not TMDB_API_KEY:
         return jsonify({'error': 'TMDB API key not configured'}), 500
@@ -519,121 +484,34 @@ def get_recommendation():
         if not user_analysis['genres']:
             return jsonify({'error': 'No genres found in provided movies'}), 400
         
-        # Get candidates more efficiently with parallel requests
-        import concurrent.futures
-        import threading
+        seen_set = load_seen_set(user.id)
         
-        all_candidates = []
-        primary_genres = user_analysis['primary_genres'][:2]
+        # Get user feedback for advanced scoring
+        feedback_data = get_recent_feedback(user)
         
-        def fetch_discover_movies(genres, sort_by='vote_average.desc', page=1):
-            try:
-                response = requests.get(
-                    f"{TMDB_BASE_URL}/discover/movie",
-                    params={
-                        'api_key': TMDB_API_KEY,
-                        'with_genres': ','.join(map(str, genres)) if isinstance(genres, list) else str(genres),
-                        'sort_by': sort_by,
-                        'vote_count.gte': 30,  # Higher threshold for quality
-                        'vote_average.gte': 6.5,  # Higher quality baseline
-                        'include_adult': False,
-                        'page': page
-                    },
-                    timeout=1.5  # Very fast timeout
-                )
-                return response.json().get('results', [])[:25] if response.ok else []
-            except:
-                return []
+        # Serve from the precomputed slate when the profile hasn't changed since it was ranked
+        version = profile_version(user_movies, feedback_data)
+        recommendation = pick_from_slate(
+            load_slate(user.id), version, make_candidate_filter(user_movies, excluded_ids, seen_set)
+        )
+        if recommendation:
+            save_recommendation(user, seen_set, recommendation)
+            return jsonify({'recommendation': recommendation})
         
-        def fetch_similar_movies(movie_id):
-            try:
-                response = requests.get(
-                    f"{TMDB_BASE_URL}/movie/{movie_id}/similar",
-                    params={
-                        'api_key': TMDB_API_KEY, 
-                        'page': 1,
-                        'include_adult': False
-                    },
-                    timeout=2
-                )
-                results = response.json().get('results', []) if response.ok else []
-                # Additional filtering for explicitly pornographic content
-                filtered_results = [
-                    movie for movie in results 
-                    if not movie.get('adult', False) and 
-                    not is_adult_content(movie)
-                ]
-                return filtered_results[:15]
-            except Exception as e:
-                print(f"Similar movies request failed: {e}")
-                return []
-        
-        # Ultra-fast concurrent requests
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            futures = []
-            
-            # Primary genre discovery
-            futures.append(executor.submit(fetch_discover_movies, primary_genres, 'vote_average.desc'))
-            
-            # Similar movies (optional, skip if slow)
-            if user_movies:
-                best_movie = max(user_movies, key=lambda m: m.get('vote_average', 0))
-                futures.append(executor.submit(fetch_similar_movies, best_movie['id']))
-            
-            # Collect results with very short timeout
-            for future in concurrent.futures.as_completed(futures, timeout=3):
-                try:
-                    results = future.result()
-                    if results:
-                        all_candidates.extend(results)
-                except:
-                    continue  # Skip failed requests silently
-        
-        # Fast deduplication and filtering
-        seen_ids = set(excluded_ids)
-        unique_candidates = []
-        
-        for movie in all_candidates:
-            movie_id = movie.get('id')
-            if (movie_id and movie_id not in seen_ids and
-                movie.get('vote_average', 0) >= 6.0 and
-                movie.get('poster_path') and
-                movie.get('overview') and
-                len(movie.get('overview', '')) > 20 and
-                not movie.get('adult', False) and
-                not is_adult_content(movie)):  # Additional adult content filtering
-                seen_ids.add(movie_id)
-                unique_candidates.append(movie)
-                
-                # Limit for performance while maintaining variety
-                if len(unique_candidates) >= 40:  # Reduced for speed
-                    break
+        accept = make_candidate_filter(user_movies, excluded_ids, seen_set)
+        
+        # Fan out over candidate sources until the pool is full or the budget is spent;
+        # an empty pool because TMDB shed or failed the calls raises TMDBUnavailable (503)
+        sources = build_candidate_sources(user_movies, user_analysis, user.id)
+        unique_candidates = gather_candidates(sources, accept)
         
         if not unique_candidates:
             return jsonify({'error': 'No suitable recommendations found'}), 404
         
-        # Get user feedback for advanced scoring
-        recent_feedback = models.Recommendation.query.filter_by(
-            user_id=user.id
-        ).filter(
-            models.Recommendation.was_liked.isnot(None)
-        ).order_by(
-            models.Recommendation.recommended_at.desc()
-        ).limit(20).all()
-        
-        feedback_data = []
-        for rec in recent_feedback:
-            if rec.genres:
-                feedback_data.append({
-                    'genres': rec.genres,
-                    'liked': rec.was_liked
-                })
-        
-        # Use improved recommendation function
-        top_recommendations = recommend_movie(user_movies, unique_candidates, feedback_data)
+        # Use improved recommendation function; the rest of the ranking becomes the slate
+        top_recommendations = recommend_movie(user_movies, unique_candidates, feedback_data, k=SLATE_SIZE)
         
         if top_recommendations:
-            import random
             # Select randomly from top 3 recommendations for variety
             recommendation = random.choice(top_recommendations[:3])
         else:
@@ -643,69 +521,153 @@ def get_recommendation():
         if not recommendation:
             return jsonify({'error': 'No suitable recommendations found'}), 404
         
-        # Get detailed movie information for genres
-        movie_details_response = requests.get(
-            f"{TMDB_BASE_URL}/movie/{recommendation['id']}",
-            params={'api_key': TMDB_API_KEY},
-            timeout=10
-        )
-        
-        if movie_details_response.ok:
-            detailed_movie = movie_details_response.json()
-            genres_info = detailed_movie.get('genres', [])
-        else:
-            genres_info = []
-        
-        # Save recommendation to database
-        db_recommendation = models.Recommendation(
-            user_id=user.id,
-            tmdb_id=recommendation['id'],
-            title=recommendation.get('title', ''),
-            release_date=recommendation.get('release_date', ''),
-            poster_path=recommendation.get('poster_path', ''),
-            overview=recommendation.get('overview', ''),
-            vote_average=recommendation.get('vote_average', 0),
-            genres=genres_info
-        )
-        db.session.add(db_recommendation)
-        db.session.commit()
+        save_recommendation(user, seen_set, recommendation)
+        save_slate(user.id, version, user_movies, top_recommendations)
         
         return jsonify({'recommendation': recommendation})
         
-    except requests.exceptions.RequestException as e:
+    except TMDBError as e:
         return jsonify({'error': f'Failed to get recommendation: {str(e)}'}), 500
 
-@app.route('/api/movie-details/<int:movie_id>')
-def get_movie_details(movie_id):
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/api/get-recommendation/stream', methods=['POST'])
+def stream_recommendation():
+    """Progressive variant of get_recommendation using Server-Sent Events
+    
+    Emits provisional `pick` events as soon as the fastest candidate source
+    returns and again whenever a slower source changes the top pick, then a
+    final `pick`, then `details` once the full movie details are fetched.
+    """
     if not TMDB_API_KEY:
         return jsonify({'error': 'TMDB API key not configured'}), 500
     
-    try:
-        response = requests.get(
-            f"{TMDB_BASE_URL}/movie/{movie_id}",
-            params={'api_key': TMDB_API_KEY},
-            timeout=10
+    data = request.get_json()
+    user_movies = data.get('movies', [])
+    excluded_ids = data.get('excluded_ids', [])
+    
+    if len(user_movies) < 4:
+        return jsonify({'error': 'Need at least 4 movies for recommendation'}), 400
+    
+    # The session cookie has to be set before streaming starts
+    user = get_or_create_user()
+    user_analysis = analyze_user_preferences(user_movies)
+    
+    if not user_analysis['genres']:
+        return jsonify({'error': 'No genres found in provided movies'}), 400
+    
+    def finish(recommendation):
+        yield sse_event('pick', {'recommendation': recommendation, 'final': True})
+        
+        try:
+            yield sse_event('details', {'movie': tmdb.get(f"/movie/{recommendation['id']}")})
+        except (TMDBError, TMDBUnavailable) as e:
+            print(f"Recommendation details request failed: {e}")
+        yield sse_event('done', {})
+    
+    def generate():
+        seen_set = load_seen_set(user.id)
+        feedback_data = get_recent_feedback(user)
+        
+        # A current precomputed slate answers with a final pick straight away
+        version = profile_version(user_movies, feedback_data)
+        recommendation = pick_from_slate(
+            load_slate(user.id), version, make_candidate_filter(user_movies, excluded_ids, seen_set)
         )
+        if recommendation:
+            save_recommendation(user, seen_set, recommendation)
+            yield from finish(recommendation)
+            return
+        
+        accept = make_candidate_filter(user_movies, excluded_ids, seen_set)
+        
+        # Collaborative candidates need their own TMDB call, so provisional
+        # picks are scored without them until it completes
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        collaborative_future = executor.submit(get_collaborative_candidates, user_movies)
+        profile = build_profile(user_movies, feedback_data, set())
+        has_collaborative = False
+        
+        pool = []
+        top = []
+        shown = None
+        try:
+            sources = build_candidate_sources(user_movies, user_analysis, user.id)
+            for batch in iter_candidates(sources, accept):
+                pool.extend(batch)
+                if not has_collaborative and collaborative_future.done():
+                    profile = build_profile(user_movies, feedback_data, collaborative_future.result())
+                    has_collaborative = True
+                top = scoring_pool.rank(profile, pool, k=5)
+                if top and top[0]['id'] != (shown and shown['id']):
+                    shown = top[0]
+                    yield sse_event('pick', {'recommendation': shown, 'final': False})
+            
+            if not pool:
+                yield sse_event('error', {'error': 'No suitable recommendations found'})
+                return
+            
+            # Final ranking includes collaborative candidates and is kept as the slate
+            if not has_collaborative:
+                profile = build_profile(user_movies, feedback_data, collaborative_future.result())
+            top = scoring_pool.rank(profile, pool, k=SLATE_SIZE)
+        except TMDBUnavailable as e:
+            # Headers are already sent, so this event stands in for the 503
+            yield sse_event('unavailable', {
+                'error': 'Movie service is temporarily unavailable, please try again shortly',
+                'retry_after': e.retry_after
+            })
+            return
+        finally:
+            executor.shutdown(wait=False)
+        
+        # Keep what the user is already looking at if it is still a top 3
+        # pick, otherwise select randomly from the top 3 for variety
+        finalists = top[:3] or pool[:1]
+        if shown and any(movie['id'] == shown['id'] for movie in finalists):
+            recommendation = shown
+        else:
+            recommendation = random.choice(finalists)
         
-        response.raise_for_status()
-        movie_details = response.json()
+        save_recommendation(user, seen_set, recommendation)
+        save_slate(user.id, version, user_movies, top)
+        yield from finish(recommendation)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/movie-details/<int:movie_id>')
+def get_movie_details(movie_id):
+    if not TMDB_API_KEY:
+        return jsonify({'error': 'TMDB API key not configured'}), 500
+    
+    try:
+        movie_details = tmdb.get(f"/movie/{movie_id}")
         
         return jsonify({'movie': movie_details})
         
-    except requests.exceptions.RequestException as e:
+    except TMDBError as e:
         return jsonify({'error': f'Failed to get movie details: {str(e)}'}), 500
 
-@app.route('/api/user-history')
+@bp.route('/api/user-history')
 def get_user_history():
     """Get user's movie preferences and recommendation history"""
     try:
         user = get_or_create_user()
         
-        # Get user's favorite movies
-        user_movies = models.UserMovie.query.filter_by(user_id=user.id).order_by(models.UserMovie.added_at.desc()).all()
-        
-        # Get user's recommendation history
-        recommendations = models.Recommendation.query.filter_by(user_id=user.id).order_by(models.Recommendation.recommended_at.desc()).all()
+        # Read the id on the primary; a new user may not have reached the replica yet
+        user_id = user.id
+        with use_replica():
+            # Get user's favorite movies
+            user_movies = models.UserMovie.query.filter_by(user_id=user_id).order_by(models.UserMovie.added_at.desc()).all()
+            
+            # Get user's recommendation history
+            recommendations = models.Recommendation.query.filter_by(user_id=user_id).order_by(models.Recommendation.recommended_at.desc()).all()
         
         return jsonify({
             'user_movies': [{
@@ -727,7 +689,26 @@ def get_user_history():
     except Exception as e:
         return jsonify({'error': f'Failed to get user history: {str(e)}'}), 500
 
-@app.route('/api/recommendation-feedback', methods=['POST'])
+def was_recommended(user_id, tmdb_id):
+    """Check a movie was recommended to the user, allowing for unflushed writes
+    
+    The recommendation may still be in this worker's write buffer, or in
+    another worker's until its next flush, so a miss is re-checked for up
+    to two flush intervals before giving up.
+    """
+    deadline = time.monotonic() + (write_buffer.flush_interval * 2 if write_buffer.enabled else 0)
+    while True:
+        if tmdb_id in write_buffer.pending_recommendation_ids(user_id) or db.session.query(
+            models.Recommendation.query.filter_by(tmdb_id=tmdb_id, user_id=user_id).exists()
+        ).scalar():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        # End the read transaction so the next check sees the other worker's commit
+        db.session.rollback()
+        time.sleep(0.2)
+
+@bp.route('/api/recommendation-feedback', methods=['POST'])
 def recommendation_feedback():
     """Allow users to provide feedback on recommendations"""
     try:
@@ -735,25 +716,23 @@ def recommendation_feedback():
         recommendation_id = data.get('recommendation_id')
         liked = data.get('liked')  # True for liked, False for disliked
         
-        user = get_or_create_user()
+        if not recommendation_id or liked is None:
+            return jsonify({'error': 'Recommendation ID and feedback are required'}), 400
         
-        recommendation = models.Recommendation.query.filter_by(
-            tmdb_id=recommendation_id,
-            user_id=user.id
-        ).first()
+        user_id = get_or_create_user().id
         
-        if not recommendation:
+        if not was_recommended(user_id, recommendation_id):
             return jsonify({'error': 'Recommendation not found'}), 404
         
-        recommendation.was_liked = liked
-        db.session.commit()
+        # Applied to the user's latest recommendation of this movie on the next flush
+        write_buffer.set_feedback(user_id, recommendation_id, liked)
         
         return jsonify({'success': True, 'message': 'Feedback recorded'})
         
     except Exception as e:
         return jsonify({'error': f'Failed to record feedback: {str(e)}'}), 500
 
-@app.route('/api/movie-suggestions', methods=['POST'])
+@bp.route('/api/movie-suggestions', methods=['POST'])
 def get_movie_suggestions():
     """Get movie suggestions for autocomplete"""
     if not TMDB_API_KEY:
@@ -766,28 +745,20 @@ def get_movie_suggestions():
         return jsonify({'movies': []})
     
     try:
-        response = requests.get(
-            f"{TMDB_BASE_URL}/search/movie",
-            params={
-                'api_key': TMDB_API_KEY,
-                'query': query,
-                'include_adult': False,
-                'page': 1
-            },
-            timeout=10
-        )
-        
-        response.raise_for_status()
-        data = response.json()
+        data = tmdb.get('/search/movie', {
+            'query': query,
+            'include_adult': False,
+            'page': 1
+        })
         
         movies = data.get('results', [])[:5]  # Limit to 5 suggestions
         
         return jsonify({'movies': movies})
         
-    except requests.exceptions.RequestException as e:
+    except TMDBError as e:
         return jsonify({'error': f'Failed to fetch suggestions: {str(e)}'}), 500
 
-@app.route('/api/add-to-watchlist', methods=['POST'])
+@bp.route('/api/add-to-watchlist', methods=['POST'])
 def add_to_watchlist():
     """Add a movie to user's watchlist"""
     try:
@@ -811,46 +782,41 @@ def add_to_watchlist():
         
         # Get movie details from TMDB
         try:
-            response = requests.get(
-                f"{TMDB_BASE_URL}/movie/{movie_id}",
-                params={'api_key': TMDB_API_KEY},
-                timeout=10
-            )
-            
-            if response.ok:
-                movie_data = response.json()
-                
-                watchlist_item = models.Watchlist(
-                    user_id=user.id,
-                    tmdb_id=movie_id,
-                    title=movie_data.get('title', title),
-                    release_date=movie_data.get('release_date', ''),
-                    poster_path=movie_data.get('poster_path', ''),
-                    overview=movie_data.get('overview', ''),
-                    vote_average=movie_data.get('vote_average', 0),
-                    genres=movie_data.get('genres', [])
-                )
-                
-                db.session.add(watchlist_item)
-                db.session.commit()
-                
-                return jsonify({'success': True, 'message': 'Movie added to watchlist'})
-            else:
-                return jsonify({'error': 'Failed to fetch movie details'}), 500
-                
-        except requests.exceptions.RequestException:
+            movie_data = tmdb.get(f"/movie/{movie_id}")
+        except TMDBUnavailable as e:
+            return tmdb_unavailable(e)
+        except TMDBError:
             return jsonify({'error': 'Failed to fetch movie details'}), 500
         
+        watchlist_item = models.Watchlist(
+            user_id=user.id,
+            tmdb_id=movie_id,
+            title=movie_data.get('title', title),
+            release_date=movie_data.get('release_date', ''),
+            poster_path=movie_data.get('poster_path', ''),
+            overview=movie_data.get('overview', ''),
+            vote_average=movie_data.get('vote_average', 0),
+            genres=movie_data.get('genres', [])
+        )
+        
+        db.session.add(watchlist_item)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Movie added to watchlist'})
+        
     except Exception as e:
         return jsonify({'error': f'Failed to add to watchlist: {str(e)}'}), 500
 
-@app.route('/api/watchlist')
+@bp.route('/api/watchlist')
 def get_watchlist():
     """Get user's watchlist"""
     try:
         user = get_or_create_user()
         
-        watchlist_items = models.Watchlist.query.filter_by(user_id=user.id).order_by(models.Watchlist.added_at.desc()).all()
+        # Read the id on the primary; a new user may not have reached the replica yet
+        user_id = user.id
+        with use_replica():
+            watchlist_items = models.Watchlist.query.filter_by(user_id=user_id).order_by(models.Watchlist.added_at.desc()).all()
         
         return jsonify({
             'watchlist': [{
@@ -866,7 +832,7 @@ def get_watchlist():
     except Exception as e:
         return jsonify({'error': f'Failed to get watchlist: {str(e)}'}), 500
 
-@app.route('/api/download-watchlist-csv')
+@bp.route('/api/download-watchlist-csv')
 def download_watchlist_csv():
     """Download user's watchlist as CSV"""
     try:
@@ -888,7 +854,6 @@ def download_watchlist_csv():
             csv_content += f'"{title}",{year},{item.tmdb_id}\n'
         
         # Return as downloadable file
-        from flask import Response
         return Response(
             csv_content,
             mimetype="text/csv",
@@ -898,7 +863,54 @@ def download_watchlist_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/remove-from-watchlist', methods=['POST'])
+@bp.route('/api/import', methods=['POST'])
+def import_csv():
+    """Bulk import favorites or watchlist from a CSV/Letterboxd export
+    
+    Titles are resolved by a background job; the response points at
+    /api/import/<id>, which reports progress and then the result.
+    """
+    try:
+        upload = request.files.get('file')
+        if upload:
+            text = upload.read().decode('utf-8-sig')
+        else:
+            text = request.get_data(as_text=True)
+        target = request.values.get('target', 'favorites')
+        
+        if target not in IMPORT_TARGETS:
+            return jsonify({'error': f'Unknown import target "{target}"'}), 400
+        
+        rows = parse_import_csv(text)
+        if not rows:
+            return jsonify({'error': 'No movies found in file'}), 400
+        
+        user = get_or_create_user()
+        job = start_import_job(user, rows, target)
+        status_url = url_for('main.import_status', job_id=job.id)
+        
+        return jsonify({'success': True, 'status_url': status_url, **import_job_status(job)}), 202, {'Location': status_url}
+        
+    except (CSVImportError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Failed to read import file: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to import movies: {str(e)}'}), 500
+
+@bp.route('/api/import/<int:job_id>')
+def import_status(job_id):
+    """Progress of a bulk import, with its result once it has finished"""
+    user = get_or_create_user()
+    job = models.ImportJob.query.filter_by(id=job_id, user_id=user.id).first()
+    
+    if not job:
+        return jsonify({'error': 'Import not found'}), 404
+    
+    response = jsonify(import_job_status(job))
+    if job.retry_after:
+        response.headers['Retry-After'] = str(job.retry_after)
+    return response
+
+@bp.route('/api/remove-from-watchlist', methods=['POST'])
 def remove_from_watchlist():
     """Remove a movie from user's watchlist"""
     try:
@@ -925,6 +937,3 @@ def remove_from_watchlist():
         
     except Exception as e:
         return jsonify({'error': f'Failed to remove from watchlist: {str(e)}'}), 500
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,254 @@
+import concurrent.futures
+import os
+import threading
+import time
+
+from flask import current_app
+
+import models
+import tmdb
+from content_filter import filter_safe
+from tmdb import TMDBError, TMDBUnavailable
+
+# Stop fanning out once this many usable candidates are pooled or the budget runs out
+CANDIDATE_POOL_TARGET = int(os.environ.get("CANDIDATE_POOL_TARGET", 40))
+CANDIDATE_LATENCY_BUDGET = float(os.environ.get("CANDIDATE_LATENCY_BUDGET", 2.5))
+MAX_IN_FLIGHT = int(os.environ.get("CANDIDATE_MAX_IN_FLIGHT", 4))
+# Most of the pool target the local catalog may fill; its rows carry no
+# vote counts or popularity and skip the discover quality thresholds
+LOCAL_CATALOG_SHARE = float(os.environ.get("LOCAL_CATALOG_SHARE", 0.25))
+
+# Shared with collaborative filtering so both hit the same TMDB cache entry
+SIMILAR_PARAMS = {'page': 1, 'include_adult': False}
+
+# Smoothing factor for per-source yield/latency moving averages
+STATS_ALPHA = 0.2
+
+_stats_lock = threading.Lock()
+_source_stats = {}
+
+
+class CandidateSource:
+    """A single candidate fetch, grouped by kind for yield statistics"""
+
+    def __init__(self, kind, fetch, share=None):
+        self.kind = kind
+        self.fetch = fetch
+        # Largest fraction of the pool target this source may fill, if capped
+        self.share = share
+
+
+def _discover(params, timeout):
+    # TMDBUnavailable propagates so iter_candidates can tell shedding from no matches
+    try:
+        return tmdb.get('/discover/movie', {
+            'sort_by': 'vote_average.desc',
+            'vote_count.gte': 30,  # Higher threshold for quality
+            'vote_average.gte': 6.5,  # Higher quality baseline
+            'include_adult': False,
+            'page': 1,
+            **params
+        }, timeout=timeout).get('results', [])[:25]
+    except TMDBError as e:
+        print(f"Discover request failed: {e}")
+        return []
+
+
+def _similar(movie_id, timeout):
+    try:
+        return tmdb.get(f"/movie/{movie_id}/similar", SIMILAR_PARAMS, timeout=timeout).get('results', [])[:15]
+    except TMDBError as e:
+        print(f"Similar movies request failed: {e}")
+        return []
+
+
+def _local_catalog(user_id, genres, limit=200):
+    """Movies other users added as favorites that share a preferred genre"""
+    rows = models.UserMovie.query.filter(
+        models.UserMovie.user_id != user_id
+    ).order_by(
+        models.UserMovie.added_at.desc()
+    ).limit(limit).all()
+
+    preferred = set(genres)
+    results = []
+    for row in rows:
+        if preferred.intersection(row.genre_ids or []):
+            results.append({
+                'id': row.tmdb_id,
+                'title': row.title,
+                'release_date': row.release_date,
+                'poster_path': row.poster_path,
+                'overview': row.overview,
+                'vote_average': row.vote_average or 0,
+                'genre_ids': row.genre_ids or []
+            })
+    return results
+
+
+def build_candidate_sources(user_movies, user_analysis, user_id=None, timeout=1.5):
+    """Build the candidate sources for a user, most specific first"""
+    primary = user_analysis['primary_genres']
+    sources = []
+
+    def discover(kind, params):
+        sources.append(CandidateSource(kind, lambda: _discover(params, timeout)))
+
+    # Genre pairs (AND), then the top genre alone
+    pairs = [(primary[i], primary[j]) for i in range(len(primary)) for j in range(i + 1, len(primary))]
+    for pair in pairs:
+        discover('discover_genres', {'with_genres': ','.join(map(str, pair))})
+    if primary:
+        discover('discover_genres', {'with_genres': str(primary[0])})
+
+    # Era-filtered discover across any preferred genre (OR)
+    if primary:
+        discover('discover_era', {
+            'with_genres': '|'.join(map(str, primary)),
+            'primary_release_date.gte': user_analysis['era_start'],
+            'primary_release_date.lte': user_analysis['era_end'],
+            'sort_by': 'popularity.desc'
+        })
+
+    # Deeper pages of the strongest genre query
+    top_genres = ','.join(map(str, primary[:2]))
+    if top_genres:
+        for page in (2, 3):
+            discover('discover_pages', {'with_genres': top_genres, 'page': page})
+
+    # Similar-of-each user movie, highest rated first
+    for movie in sorted(user_movies, key=lambda m: m.get('vote_average', 0), reverse=True):
+        if movie.get('id'):
+            movie_id = movie['id']
+            sources.append(CandidateSource('similar', lambda movie_id=movie_id: _similar(movie_id, timeout)))
+
+    # Other users' favorites are scheduled like any other source, on a
+    # worker thread with its own app context, and capped to a share of the pool
+    if user_id is not None:
+        app = current_app._get_current_object()
+
+        def local_catalog():
+            with app.app_context():
+                return _local_catalog(user_id, user_analysis['genres'])
+
+        sources.append(CandidateSource('local_catalog', local_catalog, share=LOCAL_CATALOG_SHARE))
+
+    return sources
+
+
+def _priority(kind):
+    """Expected new candidates per second; untried kinds are explored first"""
+    with _stats_lock:
+        stats = _source_stats.get(kind)
+    if not stats:
+        return float('inf')
+    return stats['yield'] / max(stats['latency'], 0.05)
+
+
+def _record(kind, new_candidates, latency):
+    with _stats_lock:
+        stats = _source_stats.get(kind)
+        if not stats:
+            _source_stats[kind] = {'calls': 1, 'yield': float(new_candidates), 'latency': latency}
+            return
+        stats['calls'] += 1
+        stats['yield'] += STATS_ALPHA * (new_candidates - stats['yield'])
+        stats['latency'] += STATS_ALPHA * (latency - stats['latency'])
+
+
+def iter_candidates(sources, accept, target=None, budget=None, max_in_flight=None):
+    """
+    Fan out over candidate sources until the pool target or latency budget is hit
+
+    Args:
+        sources: CandidateSource list from build_candidate_sources
+        accept: Callable that takes a safe movie and returns True if it is
+                usable and not yet pooled. It records the id unless called
+                with record=False
+        target: Number of accepted candidates to stop at
+        budget: Seconds after which no further results are waited on
+
+    Yields:
+        Lists of newly accepted candidates, one per completed source
+
+    Raises:
+        TMDBUnavailable: if nothing was pooled and at least one source was
+            shed or hit an open circuit, so callers can answer 503
+    """
+    target = target or CANDIDATE_POOL_TARGET
+    budget = budget or CANDIDATE_LATENCY_BUDGET
+    max_in_flight = max_in_flight or MAX_IN_FLIGHT
+    deadline = time.monotonic() + budget
+    pooled = 0
+    unavailable = []
+
+    def take(source, results, started):
+        nonlocal pooled
+        limit = target
+        if source.share is not None:
+            limit = min(limit, pooled + max(1, int(target * source.share)))
+        accepted = []
+        # New usable movies past the limit still count towards the source's
+        # yield, so a source isn't penalised for finishing after the pool filled
+        overflow = set()
+        for movie in filter_safe(results or []):
+            if pooled < limit:
+                if accept(movie):
+                    accepted.append(movie)
+                    pooled += 1
+            elif movie.get('id') not in overflow and accept(movie, record=False):
+                overflow.add(movie.get('id'))
+        _record(source.kind, len(accepted) + len(overflow), time.monotonic() - started)
+        return accepted
+
+    # Stable sort keeps build order within a kind
+    pending = list(sources)
+    pending.sort(key=lambda s: _priority(s.kind), reverse=True)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+    in_flight = {}
+    try:
+        while pooled < target:
+            while pending and len(in_flight) < max_in_flight:
+                source = pending.pop(0)
+                in_flight[executor.submit(source.fetch)] = (source, time.monotonic())
+
+            remaining = deadline - time.monotonic()
+            if not in_flight or remaining <= 0:
+                break
+
+            done, _ = concurrent.futures.wait(
+                in_flight, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                source, started = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except TMDBUnavailable as e:
+                    print(f"Candidate source {source.kind} unavailable: {e}")
+                    unavailable.append(e)
+                    results = []
+                except Exception as e:
+                    print(f"Candidate source {source.kind} failed: {e}")
+                    results = []
+                accepted = take(source, results, started)
+                if accepted:
+                    yield accepted
+
+            # Re-rank what's left using the freshest yield statistics
+            pending.sort(key=lambda s: _priority(s.kind), reverse=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not pooled and unavailable:
+        raise TMDBUnavailable(
+            'TMDB candidate sources are unavailable', max(e.retry_after for e in unavailable)
+        )
+
+
+def gather_candidates(sources, accept, target=None, budget=None, max_in_flight=None):
+    """Collect candidates from all sources into a single list"""
+    candidates = []
+    for batch in iter_candidates(sources, accept, target, budget, max_in_flight):
+        candidates.extend(batch)
+    return candidates
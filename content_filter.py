@@ -0,0 +1,51 @@
+import re
+
+# Only filter out explicitly pornographic content, not general adult themes
+PORNOGRAPHIC_KEYWORDS = [
+    'porn', 'xxx', 'hardcore', 'explicit', 'pornographic', 'adult film',
+    'sex tape', 'erotic film', 'blue movie', 'stag film'
+]
+
+# Matched against title and overview in a single pass. Only the start of a
+# keyword is anchored, so "pornography" still matches but "scorn" does not
+_KEYWORD_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(re.escape(k) for k in sorted(PORNOGRAPHIC_KEYWORDS, key=len, reverse=True)) + r')',
+    re.IGNORECASE
+)
+
+# Obvious adult film title patterns ("Adult ..." but not "Young Adult")
+_TITLE_PATTERN = re.compile(r'\badult\s', re.IGNORECASE)
+
+# Verdicts are stable per movie, so cache them by tmdb_id
+MAX_CACHED_VERDICTS = 50000
+_verdicts = {}
+
+
+def _check(movie):
+    if movie.get('adult', False):
+        return True
+
+    title = movie.get('title') or ''
+    if _TITLE_PATTERN.search(title):
+        return True
+
+    return bool(_KEYWORD_PATTERN.search(f"{title}\n{movie.get('overview') or ''}"))
+
+
+def is_adult_content(movie):
+    """Check if movie is flagged adult or contains explicitly pornographic content"""
+    movie_id = movie.get('id')
+    if movie_id is None:
+        return _check(movie)
+
+    verdict = _verdicts.get(movie_id)
+    if verdict is None:
+        if len(_verdicts) >= MAX_CACHED_VERDICTS:
+            _verdicts.clear()
+        verdict = _verdicts[movie_id] = _check(movie)
+    return verdict
+
+
+def filter_safe(movies):
+    """Drop adult content from a batch of candidates"""
+    return [movie for movie in movies if not is_adult_content(movie)]
@@ -0,0 +1,197 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+# Connection pool settings, applied to the primary and the replica alike.
+# Pre-ping costs a round-trip per checkout; with pool_recycle below the
+# server's idle timeout it can usually be turned off
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 300))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+
+# Read-only queries wrapped in use_replica() go here when it is set
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+REPLICA_BIND = 'replica'
+
+# Upper bounds in seconds of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_metrics = {}
+
+
+class PoolMetrics:
+    """Checkout counts and wait times for one engine's connection pool"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+        self.interval_peak = 0
+        self.buckets = [0] * len(WAIT_BUCKETS)
+
+    def record(self, pool, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            checked_out = pool.checkedout()
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.interval_peak = max(self.interval_peak, checked_out)
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self.buckets[index] += 1
+                    break
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def take_interval_peak(self):
+        """Peak connections in use since the last call"""
+        with self._lock:
+            peak, self.interval_peak = self.interval_peak, 0
+            return peak
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+                'peak_checked_out': self.peak_checked_out,
+                'buckets': list(self.buckets),
+            }
+
+
+def _timed_pool_class(name):
+    """A QueuePool subclass that records checkout waits under `name`
+
+    The metrics live on the class so they survive engine.dispose(), which
+    replaces the pool with a new instance of the same class.
+    """
+    metrics = _metrics.setdefault(name, PoolMetrics(name))
+
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeout:
+                metrics.record_timeout()
+                raise
+            metrics.record(self, time.perf_counter() - start)
+            return connection
+
+    TimedQueuePool.metrics = metrics
+    return TimedQueuePool
+
+
+def engine_options(url, name='primary'):
+    """SQLAlchemy engine options for a database URL, from the DB_POOL_* settings"""
+    options = {
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    parsed = make_url(url) if url else None
+    if parsed is None or (parsed.drivername.startswith('sqlite') and parsed.database in (None, '', ':memory:')):
+        # In-memory SQLite gets a StaticPool, which has no size or queue
+        return options
+    options.update({
+        "poolclass": _timed_pool_class(name),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    })
+    return options
+
+
+def configure(app):
+    """Set the primary and (optional) replica engine config on an app"""
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    if DATABASE_REPLICA_URL:
+        app.config["SQLALCHEMY_BINDS"] = {
+            REPLICA_BIND: {"url": DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL, REPLICA_BIND)}
+        }
+
+
+def pool_metrics():
+    """Snapshot of checkout metrics per pool in this process"""
+    return {name: metrics.snapshot() for name, metrics in _metrics.items()}
+
+
+def take_interval_peaks():
+    """Peak connections in use per pool since the last call"""
+    return {name: metrics.take_interval_peak() for name, metrics in _metrics.items()}
+
+
+def reset_pool_metrics():
+    """Zero the metrics, e.g. in a forked worker that inherited the master's"""
+    for metrics in _metrics.values():
+        with metrics._lock:
+            metrics.reset()
+
+
+def format_pool_metrics(snapshot):
+    parts = []
+    for name, metrics in snapshot.items():
+        mean_ms = metrics['wait_total'] / metrics['checkouts'] * 1000 if metrics['checkouts'] else 0.0
+        parts.append(f"{name}: checkouts={metrics['checkouts']} wait_mean={mean_ms:.2f}ms "
+                     f"wait_max={metrics['wait_max'] * 1000:.1f}ms timeouts={metrics['timeouts']} "
+                     f"peak_checked_out={metrics['peak_checked_out']}")
+    return '; '.join(parts) or 'no pooled connections'
+
+
+@contextlib.contextmanager
+def use_replica():
+    """Send queries made inside this block to the read replica, if one is configured
+
+    Only wrap reads that can tolerate replication lag. Flushes always go to
+    the primary.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class RoutingSession(Session):
+    """Session that routes reads inside use_replica() to the replica bind
+
+    Refreshes of expired attributes and lazy loads hang off objects this
+    session already holds, which may have just been written to the
+    primary, so they stay on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and not self._flushing and not kwargs.get('use_primary'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _keep_object_loads_on_primary(orm_execute_state):
+    if orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        orm_execute_state.bind_arguments['use_primary'] = True
@@ -0,0 +1,9 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+from database import RoutingSession
+
+class Base(DeclarativeBase):
+    pass
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
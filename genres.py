@@ -0,0 +1,84 @@
+import tmdb
+from tmdb import TMDBError, TMDBUnavailable
+
+# Bundled copy of TMDB /genre/movie/list, used when the table hasn't been seeded
+GENRE_SNAPSHOT = (
+    (28, 'Action'),
+    (12, 'Adventure'),
+    (16, 'Animation'),
+    (35, 'Comedy'),
+    (80, 'Crime'),
+    (99, 'Documentary'),
+    (18, 'Drama'),
+    (10751, 'Family'),
+    (14, 'Fantasy'),
+    (36, 'History'),
+    (27, 'Horror'),
+    (10402, 'Music'),
+    (9648, 'Mystery'),
+    (10749, 'Romance'),
+    (878, 'Science Fiction'),
+    (10770, 'TV Movie'),
+    (53, 'Thriller'),
+    (10752, 'War'),
+    (37, 'Western'),
+)
+
+# Genre-based tone mapping shared by user profiling and candidate scoring
+GENRE_TONES = {
+    28: 'thrilling',    # Action
+    35: 'comedic',      # Comedy
+    80: 'dark',         # Crime
+    18: 'dramatic',     # Drama
+    27: 'dark',         # Horror
+    10749: 'romantic',  # Romance
+    53: 'thrilling',    # Thriller
+    10752: 'dramatic',  # War
+    36: 'dramatic',     # History
+    878: 'thrilling',   # Sci-Fi
+    14: 'dark',         # Fantasy (often dark themes)
+    9648: 'dark'        # Mystery
+}
+
+
+def _table():
+    # Imported here so scoring workers, which only need GENRE_TONES, stay
+    # free of Flask and database imports
+    import shared_data
+    return shared_data.get('genres')
+
+
+def genre_objects(genre_ids):
+    """Turn TMDB genre_ids into the {id, name} objects stored with recommendations"""
+    table = _table()
+    return [{'id': genre_id, 'name': table.name(genre_id)} for genre_id in genre_ids or [] if genre_id in table]
+
+
+def fetch_genres():
+    """Fetch the current genre list from TMDB, falling back to the bundled snapshot"""
+    try:
+        genres = [(g['id'], g['name']) for g in tmdb.get('/genre/movie/list').get('genres', [])]
+        if genres:
+            return genres
+    except (TMDBError, TMDBUnavailable, ValueError, KeyError) as e:
+        print(f"Genre list request failed, using bundled snapshot: {e}")
+    return list(GENRE_SNAPSHOT)
+
+
+def seed_genres():
+    """Insert or rename Genre rows to match TMDB and refresh the registry"""
+    import models
+    import shared_data
+    from extensions import db
+
+    existing = {genre.tmdb_id: genre for genre in models.Genre.query.all()}
+    genres = fetch_genres()
+    for tmdb_id, name in genres:
+        if tmdb_id in existing:
+            existing[tmdb_id].name = name
+        else:
+            db.session.add(models.Genre(tmdb_id=tmdb_id, name=name))
+    db.session.commit()
+
+    shared_data.reload('genres')
+    return len(genres)
@@ -0,0 +1,40 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+# Load the app (and its read-only data) once in the master so workers
+# share those pages copy-on-write instead of each loading their own
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import shared_data
+    from main import app
+
+    shared_data.preload(app)
+    server.log.info("Preloaded shared data; master memory: %s",
+                    shared_data.format_memory_report(shared_data.memory_report()))
+
+
+def post_fork(server, worker):
+    import database
+
+    # Pool metrics copied from the master describe its preload, not this worker
+    database.reset_pool_metrics()
+
+
+def post_worker_init(worker):
+    import shared_data
+
+    worker.log.info("Worker %s booted; memory: %s", worker.pid,
+                    shared_data.format_memory_report(shared_data.memory_report()))
+
+
+def worker_exit(server, worker):
+    import database
+
+    worker.log.info("Worker %s exiting; connection pools: %s", worker.pid,
+                    database.format_pool_metrics(database.pool_metrics()))
@@ -0,0 +1,285 @@
+import concurrent.futures
+import csv
+import io
+import os
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+import models
+import tmdb
+from extensions import db
+from genres import genre_objects
+from tmdb import TMDBError, TMDBUnavailable
+
+# Parallel TMDB lookups per import; tmdb.get() still applies its global limiter
+IMPORT_MAX_WORKERS = int(os.environ.get("IMPORT_MAX_WORKERS", 8))
+# Uploads run as background jobs in the web process, where they share the
+# TMDB limiter with recommendations, so they get fewer threads and queue
+# behind each other
+IMPORT_JOB_MAX_WORKERS = int(os.environ.get("IMPORT_JOB_MAX_WORKERS", 4))
+IMPORT_MAX_JOBS = int(os.environ.get("IMPORT_MAX_JOBS", 1))
+MAX_IMPORT_ROWS = int(os.environ.get("MAX_IMPORT_ROWS", 5000))
+# Abort the import, without writing anything, when more than this share of
+# lookups hit an unavailable TMDB; below it those rows are reported as failed
+IMPORT_MAX_UNAVAILABLE_SHARE = float(os.environ.get("IMPORT_MAX_UNAVAILABLE_SHARE", 0.5))
+
+# Stands in for the movie of a row whose lookup couldn't reach TMDB
+UNAVAILABLE = object()
+
+# Header aliases for our own watchlist export (Title,Year,tmdbID) and
+# Letterboxd exports (Date,Name,Year,Letterboxd URI,...)
+TITLE_COLUMNS = ('title', 'name')
+YEAR_COLUMNS = ('year',)
+TMDB_ID_COLUMNS = ('tmdbid', 'tmdb_id', 'tmdb id')
+
+TARGETS = {
+    'favorites': models.UserMovie,
+    'watchlist': models.Watchlist,
+}
+
+
+class CSVImportError(ValueError):
+    """The uploaded file can't be imported"""
+
+
+def _column(fieldnames, aliases):
+    for name in fieldnames:
+        if name.strip().lower() in aliases:
+            return name
+    return None
+
+
+def parse_import_csv(text):
+    """Parse a CSV export into [{'title', 'year', 'tmdb_id'}] rows"""
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    fieldnames = reader.fieldnames or []
+    title_column = _column(fieldnames, TITLE_COLUMNS)
+    year_column = _column(fieldnames, YEAR_COLUMNS)
+    tmdb_id_column = _column(fieldnames, TMDB_ID_COLUMNS)
+
+    if not title_column and not tmdb_id_column:
+        raise CSVImportError('CSV needs a Title/Name or tmdbID column')
+
+    rows = []
+    for record in reader:
+        title = (record.get(title_column) or '').strip() if title_column else ''
+        year = (record.get(year_column) or '').strip() if year_column else ''
+        tmdb_id = (record.get(tmdb_id_column) or '').strip() if tmdb_id_column else ''
+        if not title and not tmdb_id:
+            continue
+        rows.append({
+            'title': title,
+            'year': int(year) if year.isdigit() else None,
+            'tmdb_id': int(tmdb_id) if tmdb_id.isdigit() else None
+        })
+        if len(rows) > MAX_IMPORT_ROWS:
+            raise CSVImportError(f'Imports are limited to {MAX_IMPORT_ROWS} rows')
+    return rows
+
+
+def _lookup_key(row):
+    # Rows with a tmdbID are looked up by id; the rest by title and year
+    if row['tmdb_id']:
+        return row['tmdb_id'], '', None
+    return None, row['title'].lower(), row['year']
+
+
+def _lookup(query):
+    """Resolve one (tmdb_id, title, year) query to a TMDB movie, or None"""
+    tmdb_id, title, year = query
+    try:
+        if tmdb_id:
+            return tmdb.get(f"/movie/{tmdb_id}")
+        params = {'query': title, 'include_adult': False}
+        if year:
+            params['year'] = year
+        results = tmdb.get('/search/movie', params).get('results', [])
+        return results[0] if results else None
+    except TMDBError:
+        return None
+
+
+def resolve_rows(rows, progress=None, max_workers=None):
+    """
+    Resolve parsed rows to TMDB movies concurrently
+
+    Duplicate rows are looked up once. `progress(done, total)` is called as
+    lookups finish.
+
+    Returns:
+        List of (row, movie) pairs; movie is None when nothing matched and
+        UNAVAILABLE when TMDB couldn't be reached for that row
+
+    Raises:
+        TMDBUnavailable: if more than IMPORT_MAX_UNAVAILABLE_SHARE of the
+            lookups couldn't reach TMDB
+    """
+    keys = {}
+    for row in rows:
+        keys.setdefault(_lookup_key(row), (row['tmdb_id'], row['title'], row['year']))
+
+    resolved = {}
+    unavailable = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or IMPORT_MAX_WORKERS) as executor:
+        futures = {executor.submit(_lookup, query): key for key, query in keys.items()}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            key = futures[future]
+            try:
+                resolved[key] = future.result()
+            except TMDBUnavailable as e:
+                # Report the row as retryable rather than failing the whole import
+                resolved[key] = UNAVAILABLE
+                unavailable.append(e)
+            if progress:
+                progress(done, len(futures))
+
+    if keys and len(unavailable) > len(keys) * IMPORT_MAX_UNAVAILABLE_SHARE:
+        raise TMDBUnavailable(
+            f'TMDB was unavailable for {len(unavailable)} of {len(keys)} lookups',
+            retry_after=max(e.retry_after for e in unavailable)
+        )
+
+    return [(row, resolved[_lookup_key(row)]) for row in rows]
+
+
+def _genre_ids(movie):
+    if movie.get('genre_ids') is not None:
+        return movie['genre_ids']
+    return [genre['id'] for genre in movie.get('genres', [])]
+
+
+def import_movies(user, resolved, target='favorites'):
+    """
+    Insert resolved movies for a user in one batched transaction
+
+    Movies already in the user's list (or repeated in the file) are skipped.
+
+    Returns:
+        Dict with imported/skipped counts, the titles that didn't match
+        (`unresolved`) and the titles to retry later because TMDB was
+        unavailable (`failed`)
+    """
+    model = TARGETS[target]
+    existing = {tmdb_id for (tmdb_id,) in db.session.query(model.tmdb_id).filter_by(user_id=user.id)}
+
+    values = []
+    skipped = 0
+    unresolved = []
+    failed = []
+    for row, movie in resolved:
+        if movie is UNAVAILABLE:
+            failed.append(row['title'] or str(row['tmdb_id']))
+            continue
+        if movie is None:
+            unresolved.append(row['title'] or str(row['tmdb_id']))
+            continue
+        if movie['id'] in existing:
+            skipped += 1
+            continue
+        existing.add(movie['id'])
+
+        value = {
+            'user_id': user.id,
+            'tmdb_id': movie['id'],
+            'title': movie.get('title') or row['title'],
+            'release_date': movie.get('release_date', ''),
+            'poster_path': movie.get('poster_path', ''),
+            'overview': movie.get('overview', ''),
+            'vote_average': movie.get('vote_average', 0),
+        }
+        if target == 'watchlist':
+            value['genres'] = movie.get('genres') or genre_objects(_genre_ids(movie))
+        else:
+            value['genre_ids'] = _genre_ids(movie)
+        values.append(value)
+
+    if values:
+        db.session.execute(insert(model), values)
+    db.session.commit()
+
+    return {'imported': len(values), 'skipped': skipped, 'unresolved': unresolved, 'failed': failed}
+
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def _jobs():
+    # Created on first use so gunicorn's preloading master never owns the threads
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=IMPORT_MAX_JOBS, thread_name_prefix='import-job'
+            )
+        return _job_executor
+
+
+def start_import_job(user, rows, target='favorites'):
+    """
+    Queue an import to resolve and insert in the background
+
+    The upload request returns straight away; poll import_job_status()
+    for progress and the result.
+
+    Returns:
+        The new ImportJob
+    """
+    job = models.ImportJob(user_id=user.id, target=target, total=len({_lookup_key(row) for row in rows}))
+    db.session.add(job)
+    db.session.commit()
+    _jobs().submit(_run_import_job, current_app._get_current_object(), job.id, rows, target)
+    return job
+
+
+def _update_job(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def _run_import_job(app, job_id, rows, target):
+    with app.app_context():
+        job = db.session.get(models.ImportJob, job_id)
+        _update_job(job, status='running')
+
+        # Progress is written about every 5% rather than per lookup
+        step = max(1, job.total // 20)
+
+        def progress(done, total):
+            if done == total or done - job.resolved >= step:
+                _update_job(job, resolved=done)
+
+        try:
+            resolved = resolve_rows(rows, progress, IMPORT_JOB_MAX_WORKERS)
+            result = import_movies(job.user, resolved, target)
+        except TMDBUnavailable as e:
+            db.session.rollback()
+            _update_job(job, status='failed', error=str(e), retry_after=e.retry_after)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Import job {job_id} failed: {e}")
+            _update_job(job, status='failed', error=str(e))
+        else:
+            _update_job(job, status='done', result=result)
+
+
+def import_job_status(job):
+    """JSON-ready progress of an import job, with its result once done"""
+    status = {
+        'id': job.id,
+        'status': job.status,
+        'target': job.target,
+        'total': job.total,
+        'resolved': job.resolved,
+    }
+    if job.status == 'done':
+        status.update(job.result)
+    elif job.status == 'failed':
+        status['error'] = job.error
+        status['retry_after'] = job.retry_after
+    return status
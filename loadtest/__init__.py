@@ -0,0 +1,11 @@
+"""Load tests for the recommendation app under gunicorn
+
+Usage:
+    python -m loadtest [--worker-classes sync,gthread] [--workers 2,4] [--threads 4,8]
+                       [--users 5,10,20,40] [--step-duration 30] [--report capacity.md]
+
+Each gunicorn configuration is started against a local TMDB stand-in and
+a scratch SQLite database (or DATABASE_URL), driven with scripted user
+journeys at increasing numbers of concurrent sessions, and summarised in
+a capacity report.
+"""
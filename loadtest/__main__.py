@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import loadtest
+from loadtest import fake_tmdb
+from loadtest.report import capacity_report
+from loadtest.sweep import app_env, configurations, init_database, sweep_configuration, unavailable_reason
+
+
+def _list(cast):
+    return lambda value: [cast(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description=loadtest.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-classes', type=_list(str), default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=_list(int), default=[2, 4])
+    parser.add_argument('--threads', type=_list(int), default=[4, 8], help='gthread threads per worker')
+    parser.add_argument('--users', type=_list(int), default=[5, 10, 20, 40, 80],
+                        help='concurrent sessions per load step')
+    parser.add_argument('--step-duration', type=float, default=30, help='seconds per load step')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean seconds between user actions')
+    parser.add_argument('--tmdb-latency', type=float, default=0.05, help='mean TMDB stand-in latency in seconds')
+    parser.add_argument('--p99-slo-ms', type=float, default=2000, help='recommendation p99 that counts as saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--database-url', default=os.environ.get('LOADTEST_DATABASE_URL'),
+                        help='defaults to a scratch SQLite file; use a local Postgres DSN to test Postgres')
+    parser.add_argument('--report', help='write the markdown report here instead of stdout')
+    parser.add_argument('--json', help='also write raw results as JSON')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='loadtest-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'loadtest.db')}"
+
+    tmdb_server = fake_tmdb.start(latency=args.tmdb_latency)
+    tmdb_url = fake_tmdb.base_url(tmdb_server)
+    init_database(app_env(tmdb_url, database_url, work_dir))
+    print(f'TMDB stand-in at {tmdb_url}; database {database_url}; logs in {work_dir}', file=sys.stderr)
+
+    results = []
+    for config in configurations(args.worker_classes, args.workers, args.threads):
+        name = f"{config['worker_class']}-w{config['workers']}-t{config['threads']}"
+        reason = unavailable_reason(config['worker_class'])
+        if reason:
+            print(f'Skipping {name}: {reason}', file=sys.stderr)
+            results.append({'name': name, 'config': config, 'skipped': reason})
+            continue
+        print(f'Sweeping {name}', file=sys.stderr)
+        results.append(sweep_configuration(
+            config, tmdb_url, database_url, args.users, args.step_duration, args.think_time,
+            args.p99_slo_ms, args.max_error_rate, work_dir
+        ))
+
+    report = capacity_report(results, args.p99_slo_ms, args.max_error_rate, args.tmdb_latency, database_url)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    tmdb_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Runs one load step: N concurrent virtual users for a fixed duration"""
+import glob
+import json
+import os
+import threading
+import time
+
+import requests
+
+from database import WAIT_BUCKETS
+from loadtest.journeys import Recorder, VirtualUser
+
+# The step whose latency decides saturation: the request users wait on
+KEY_STEP = 'get-recommendation/stream'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def read_pool_stats(stats_dir, since=None):
+    """
+    Cumulative pool counters summed over every worker and pool (primary and replica)
+
+    `peak_checked_out` is the most connections one worker's pool had in
+    use at once since the `since` wall-clock time.
+    """
+    total = {'checkouts': 0, 'timeouts': 0, 'wait_total': 0.0,
+             'peak_checked_out': 0, 'buckets': [0] * len(WAIT_BUCKETS), 'settings': {}}
+    for path in glob.glob(os.path.join(stats_dir, 'pool-*.json')):
+        try:
+            with open(path) as f:
+                worker = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for pool in worker['pools'].values():
+            for key in ('checkouts', 'timeouts', 'wait_total'):
+                total[key] += pool[key]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], pool['buckets'])]
+        total['peak_checked_out'] = max([total['peak_checked_out']] + [
+            peak for recorded_at, peak in worker['peak_history'] if since is None or recorded_at >= since
+        ])
+        total['settings'] = worker['settings']
+    return total
+
+
+def pool_delta(before, after):
+    """Pool activity between two read_pool_stats() snapshots"""
+    checkouts = after['checkouts'] - before['checkouts']
+    buckets = [a - b for a, b in zip(after['buckets'], before['buckets'])]
+
+    # p99 wait is reported as the upper bound of the bucket it falls in
+    wait_p99 = None
+    if checkouts:
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS, buckets):
+            seen += count
+            if seen >= checkouts * 0.99:
+                wait_p99 = bound
+                break
+
+    return {
+        'checkouts': checkouts,
+        'timeouts': after['timeouts'] - before['timeouts'],
+        'wait_mean_ms': (after['wait_total'] - before['wait_total']) / checkouts * 1000 if checkouts else 0.0,
+        'wait_p99_ms': wait_p99 * 1000 if wait_p99 is not None else None,
+        'peak_checked_out': after['peak_checked_out'],  # within the step; see read_pool_stats
+    }
+
+
+def upstream_stats(tmdb_url, reset=False):
+    response = requests.get(f"{tmdb_url}/{'__reset' if reset else '__stats'}", timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+def run_step(base_url, tmdb_url, stats_dir, users, duration, think_time=1.0):
+    """Drive `users` concurrent sessions for `duration` seconds and summarise the step"""
+    recorder = Recorder()
+    upstream_stats(tmdb_url, reset=True)
+    pool_before = read_pool_stats(stats_dir)
+    step_started_at = time.time()
+
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=VirtualUser(base_url, recorder, think_time).run, args=(stop_at,), daemon=True)
+        for _ in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # Workers write pool counters once a second
+    time.sleep(1.5)
+    return summarise(recorder.samples, users, elapsed,
+                     pool_delta(pool_before, read_pool_stats(stats_dir, since=step_started_at)), upstream_stats(tmdb_url))
+
+
+def summarise(samples, users, elapsed, pool, upstream):
+    steps = {}
+    for step, seconds, ok, status in samples:
+        entry = steps.setdefault(step, {'latencies': [], 'errors': 0, 'statuses': {}})
+        entry['latencies'].append(seconds)
+        entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+        if not ok:
+            entry['errors'] += 1
+
+    by_step = {}
+    for step, entry in sorted(steps.items()):
+        latencies = entry['latencies']
+        by_step[step] = {
+            'count': len(latencies),
+            'errors': entry['errors'],
+            'statuses': entry['statuses'],
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+
+    total = len(samples)
+    errors = sum(entry['errors'] for entry in by_step.values())
+    key = by_step.get(KEY_STEP, {})
+    return {
+        'users': users,
+        'duration_s': elapsed,
+        'requests': total,
+        'rps': total / elapsed if elapsed else 0.0,
+        'error_rate': errors / total if total else 0.0,
+        'recommendations': key.get('count', 0),
+        'key_p50_ms': key.get('p50_ms'),
+        'key_p99_ms': key.get('p99_ms'),
+        'steps': by_step,
+        'pool': pool,
+        'upstream': upstream,
+    }
@@ -0,0 +1,146 @@
+"""Local TMDB stand-in serving deterministic movies with configurable latency
+
+Point the app at it with TMDB_BASE_URL=http://127.0.0.1:<port>. It also
+tracks how many requests the app has in flight against it, which the
+capacity report shows as upstream concurrency.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from genres import GENRE_SNAPSHOT
+
+CATALOG_SIZE = 20000
+PAGE_SIZE = 20
+GENRE_IDS = [genre_id for genre_id, name in GENRE_SNAPSHOT]
+
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.blake2b(repr(parts).encode(), digest_size=8).digest(), 'little')
+
+
+def movie(movie_id, genre_ids=None):
+    """A plausible TMDB movie; the same id always gives the same movie"""
+    rng = random.Random(movie_id)
+    genre_ids = genre_ids or rng.sample(GENRE_IDS, rng.randint(1, 3))
+    return {
+        'id': movie_id,
+        'title': f'Movie {movie_id}',
+        'release_date': f'{rng.randint(1970, 2024)}-{rng.randint(1, 12):02d}-01',
+        'poster_path': f'/poster{movie_id}.jpg',
+        'overview': f'Movie {movie_id} is a generated film used for load testing the recommender.',
+        'vote_average': round(rng.uniform(5.0, 9.0), 1),
+        'vote_count': rng.randint(10, 20000),
+        'popularity': round(rng.uniform(1, 200), 1),
+        'genre_ids': genre_ids,
+        'adult': False,
+    }
+
+
+def _page(seed, genre_ids=None):
+    rng = random.Random(seed)
+    return {'page': 1, 'total_pages': 50, 'results': [
+        movie(rng.randint(1, CATALOG_SIZE), genre_ids) for _ in range(PAGE_SIZE)
+    ]}
+
+
+class UpstreamStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'requests': self.requests, 'peak_in_flight': self.peak_in_flight}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/__stats':
+            return self._send(self.server.stats.snapshot())
+        if url.path == '/__reset':
+            self.server.stats.reset()
+            return self._send({})
+
+        self.server.stats.enter()
+        try:
+            time.sleep(random.expovariate(1 / self.server.latency) if self.server.latency else 0)
+            body = self._route(url.path, params)
+            if body is None:
+                return self._send({'status_message': 'The resource could not be found.'}, 404)
+            self._send(body)
+        finally:
+            self.server.stats.leave()
+
+    def _route(self, path, params):
+        if path == '/genre/movie/list':
+            return {'genres': [{'id': genre_id, 'name': name} for genre_id, name in GENRE_SNAPSHOT]}
+        if path == '/search/movie':
+            query = params.get('query', '')
+            results = [movie(_seed('search', query, i) % CATALOG_SIZE + 1) for i in range(5)]
+            results[0]['title'] = query.title()
+            return {'page': 1, 'total_pages': 1, 'results': results}
+        if path == '/discover/movie':
+            genre_ids = [int(g) for g in re.split('[,|]', params.get('with_genres', '')) if g.isdigit()]
+            return _page(_seed('discover', sorted(params.items())), genre_ids or None)
+        match = re.fullmatch(r'/movie/(\d+)(/similar)?', path)
+        if match:
+            if match.group(2):
+                return _page(_seed('similar', match.group(1), params.get('page')))
+            details = movie(int(match.group(1)))
+            details['genres'] = [{'id': genre_id, 'name': dict(GENRE_SNAPSHOT)[genre_id]}
+                                 for genre_id in details.pop('genre_ids')]
+            details['runtime'] = 90 + int(match.group(1)) % 60
+            return details
+        return None
+
+    def _send(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start(port=0, latency=0.05):
+    """Serve the stand-in on a background thread; returns the server"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.stats = UpstreamStats()
+    threading.Thread(target=server.serve_forever, name='fake-tmdb', daemon=True).start()
+    return server
+
+
+def base_url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}'
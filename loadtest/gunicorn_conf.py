@@ -0,0 +1,67 @@
+"""gunicorn config for load tests: the app's own config plus pool metrics
+
+Each worker writes its cumulative pool checkout metrics (see
+database.pool_metrics) to $LOADTEST_STATS_DIR/pool-<pid>.json once a
+second, which the driver diffs per load step. Peak connections in use are
+recorded per second so the driver can take the peak within a step.
+"""
+import collections
+import json
+import os
+import runpy
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_app_config = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+globals().update({key: value for key, value in _app_config.items() if not key.startswith('__')})
+
+_app_post_worker_init = _app_config.get('post_worker_init')
+
+
+def _pool_settings():
+    from extensions import db
+    from main import app
+
+    with app.app_context():
+        pool = db.engine.pool
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        return {
+            'pool_class': type(pool).__name__,
+            'pool_size': pool.size() if hasattr(pool, 'size') else None,
+            'max_overflow': getattr(pool, '_max_overflow', None),
+            'pool_timeout': getattr(pool, '_timeout', None),
+            'pool_recycle': options.get('pool_recycle'),
+            'pool_pre_ping': options.get('pool_pre_ping'),
+            'replica': 'replica' in db.engines,
+        }
+
+
+def _dump(path, settings, peak_history):
+    import database
+
+    peak_history.append((time.time(), max(database.take_interval_peaks().values(), default=0)))
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'pools': database.pool_metrics(), 'peak_history': list(peak_history), 'settings': settings}, f)
+    os.replace(path + '.tmp', path)
+
+
+def post_worker_init(worker):
+    if _app_post_worker_init:
+        _app_post_worker_init(worker)
+
+    stats_dir = os.environ.get('LOADTEST_STATS_DIR')
+    if not stats_dir:
+        return
+    settings = _pool_settings()
+    path = os.path.join(stats_dir, f'pool-{worker.pid}.json')
+
+    peak_history = collections.deque(maxlen=3600)
+
+    def dump_forever():
+        while True:
+            _dump(path, settings, peak_history)
+            time.sleep(1)
+
+    threading.Thread(target=dump_forever, name='loadtest-pool-stats', daemon=True).start()
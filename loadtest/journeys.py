@@ -0,0 +1,121 @@
+"""Scripted user journeys, following the flows in static/js/app.js"""
+import json
+import random
+import time
+
+import requests
+
+# Words the journeys pick movie titles from; the TMDB stand-in resolves any query
+TITLE_WORDS = ('star', 'night', 'river', 'ghost', 'city', 'summer', 'last', 'king', 'blue', 'storm',
+               'dream', 'shadow', 'road', 'island', 'winter', 'fire', 'heart', 'empire', 'silent', 'moon')
+
+
+class Recorder:
+    """Collects (step, seconds, ok, status) samples from every virtual user"""
+
+    def __init__(self):
+        self.samples = []
+
+    def timed(self, step, response_or_error, started):
+        elapsed = time.perf_counter() - started
+        ok = isinstance(response_or_error, requests.Response) and response_or_error.status_code < 400
+        status = response_or_error.status_code if isinstance(response_or_error, requests.Response) else 'error'
+        self.samples.append((step, elapsed, ok, status))
+
+
+class VirtualUser:
+    """One browser session: picks four movies, then asks for and rates recommendations"""
+
+    def __init__(self, base_url, recorder, think_time=1.0, rounds=5, timeout=30):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.think_time = think_time
+        self.rounds = rounds
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.movies = []
+        self.current = None
+
+    def request(self, step, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            if kwargs.get('stream'):
+                response.content  # read the whole event stream inside the timing
+        except requests.RequestException as e:
+            self.recorder.timed(step, e, started)
+            return None
+        self.recorder.timed(step, response, started)
+        return response
+
+    def think(self):
+        if self.think_time:
+            time.sleep(random.expovariate(1 / self.think_time))
+
+    def run(self, stop_at):
+        """Repeat the journey until `stop_at` (a perf_counter deadline)"""
+        while time.perf_counter() < stop_at:
+            self.session.cookies.clear()
+            self.pick_movies()
+            for _ in range(self.rounds):
+                if time.perf_counter() >= stop_at or not self.recommend():
+                    break
+                self.think()
+                self.rate()
+            self.visit_watchlist()
+            self.think()
+
+    def pick_movies(self):
+        self.request('index', 'GET', '/')
+        self.movies = []
+        for _ in range(4):
+            title = ' '.join(random.sample(TITLE_WORDS, 2))
+            # Type-ahead fires once the user pauses, then the form submit searches
+            self.request('movie-suggestions', 'POST', '/api/movie-suggestions', json={'query': title[:4]})
+            response = self.request('search-movie', 'POST', '/api/search-movie', json={'title': title})
+            if response is not None and response.ok:
+                self.movies.append(response.json()['movie'])
+        self.current = None
+
+    def recommend(self):
+        if len(self.movies) < 4:
+            return False
+        response = self.request('get-recommendation/stream', 'POST', '/api/get-recommendation/stream', json={
+            'movies': self.movies,
+            'excluded_ids': [self.current['id']] if self.current else []
+        }, headers={'Accept': 'text/event-stream'}, stream=True)
+        if response is None or not response.ok:
+            return False
+        self.current = _final_pick(response.text)
+        return self.current is not None
+
+    def rate(self):
+        self.request('recommendation-feedback', 'POST', '/api/recommendation-feedback', json={
+            'recommendation_id': self.current['id'],
+            'liked': random.random() < 0.6
+        })
+        if random.random() < 0.3:
+            self.request('add-to-watchlist', 'POST', '/api/add-to-watchlist', json={
+                'movie_id': self.current['id'],
+                'title': self.current['title']
+            })
+
+    def visit_watchlist(self):
+        self.request('watchlist-page', 'GET', '/watchlist')
+        self.request('watchlist', 'GET', '/api/watchlist')
+        if random.random() < 0.2:
+            self.request('download-watchlist-csv', 'GET', '/api/download-watchlist-csv')
+        if random.random() < 0.5:
+            self.request('user-history', 'GET', '/api/user-history')
+
+
+def _final_pick(stream):
+    event = None
+    for line in stream.splitlines():
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: ') and event == 'pick':
+            data = json.loads(line[len('data: '):])
+            if data.get('final'):
+                return data['recommendation']
+    return None
@@ -0,0 +1,94 @@
+"""Capacity report: saturation point per configuration, with pool and upstream detail"""
+
+
+def saturation(steps, p99_slo_ms, max_error_rate, min_gain=0.1):
+    """
+    Find where a configuration stops keeping up
+
+    A step is saturated when recommendation p99 exceeds the SLO, the error
+    rate exceeds its limit, or throughput grows by less than `min_gain`
+    over the previous step despite more users.
+
+    Returns:
+        (sustained users, saturating step or None, reason)
+    """
+    sustained = 0
+    previous = None
+    for step in steps:
+        reason = None
+        if step['key_p99_ms'] is None:
+            reason = 'no recommendations completed'
+        elif step['key_p99_ms'] > p99_slo_ms:
+            reason = f"recommendation p99 {step['key_p99_ms']:.0f}ms > {p99_slo_ms:.0f}ms"
+        elif step['error_rate'] > max_error_rate:
+            reason = f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif previous and step['rps'] < previous['rps'] * (1 + min_gain):
+            reason = f"throughput flat ({previous['rps']:.1f} -> {step['rps']:.1f} req/s)"
+        if reason:
+            return sustained, step, reason
+        sustained = step['users']
+        previous = step
+    return sustained, None, 'not reached'
+
+
+def _ms(value):
+    return f'{value:.0f}' if value is not None else '-'
+
+
+def capacity_report(results, p99_slo_ms, max_error_rate, tmdb_latency, database_url):
+    lines = [
+        '# Capacity report',
+        '',
+        f'Saturation: recommendation p99 > {p99_slo_ms:.0f}ms, errors > {max_error_rate:.1%}, '
+        'or under 10% more throughput per step.',
+        f'TMDB stand-in latency: {tmdb_latency * 1000:.0f}ms mean. Database: `{database_url.split("@")[-1]}`.',
+        '',
+        '## Summary',
+        '',
+        '| Configuration | Sustained sessions | Peak req/s | Saturated at | Reason |',
+        '|---|---|---|---|---|',
+    ]
+    for result in results:
+        if result.get('skipped'):
+            lines.append(f"| {result['name']} | - | - | - | skipped: {result['skipped']} |")
+            continue
+        sustained, step, reason = saturation(result['steps'], p99_slo_ms, max_error_rate)
+        peak = max((s['rps'] for s in result['steps']), default=0)
+        lines.append(f"| {result['name']} | {sustained} | {peak:.1f} | "
+                     f"{step['users'] if step else '-'} | {reason} |")
+
+    for result in results:
+        if result.get('skipped'):
+            continue
+        settings = result['pool_settings']
+        lines += [
+            '',
+            f"## {result['name']}",
+            '',
+            'Pool: ' + ', '.join(f'{key}={value}' for key, value in settings.items()) if settings else 'Pool: unknown',
+            '',
+            '| Users | req/s | Errors | Rec p50 ms | Rec p99 ms | Pool checkouts | Pool wait mean ms '
+            '| Pool wait p99 ms | Pool timeouts | Pool peak in use | TMDB calls | TMDB peak in flight |',
+            '|---|---|---|---|---|---|---|---|---|---|---|---|',
+        ]
+        for step in result['steps']:
+            pool = step['pool']
+            upstream = step['upstream']
+            lines.append(
+                f"| {step['users']} | {step['rps']:.1f} | {step['error_rate']:.1%} | {_ms(step['key_p50_ms'])} "
+                f"| {_ms(step['key_p99_ms'])} | {pool['checkouts']} | {pool['wait_mean_ms']:.2f} "
+                f"| {'<=' + _ms(pool['wait_p99_ms']) if pool['wait_p99_ms'] is not None else '-'} "
+                f"| {pool['timeouts']} | {pool['peak_checked_out']} "
+                f"| {upstream['requests']} | {upstream['peak_in_flight']} |"
+            )
+
+        slowest = {}
+        for step in result['steps']:
+            for name, stats in step['steps'].items():
+                if stats['p99_ms'] > slowest.get(name, 0):
+                    slowest[name] = stats['p99_ms']
+        lines += ['', 'Worst p99 by request: ' + ', '.join(
+            f'{name} {p99:.0f}ms' for name, p99 in sorted(slowest.items(), key=lambda item: -item[1])
+        )]
+
+    return '\n'.join(lines) + '\n'
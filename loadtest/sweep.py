@@ -0,0 +1,143 @@
+"""Starts the app under each gunicorn configuration and steps up the load"""
+import importlib.util
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from loadtest.driver import read_pool_stats, run_step
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(ROOT, 'loadtest', 'gunicorn_conf.py')
+
+# Worker classes that need a package gunicorn doesn't bundle
+WORKER_CLASS_PACKAGES = {'gevent': 'gevent', 'eventlet': 'eventlet'}
+
+
+def configurations(worker_classes, workers, threads):
+    """gunicorn settings to sweep; threads only vary for gthread"""
+    configs = []
+    for worker_class in worker_classes:
+        for worker_count in workers:
+            for thread_count in (threads if worker_class == 'gthread' else [1]):
+                configs.append({'worker_class': worker_class, 'workers': worker_count, 'threads': thread_count})
+    return configs
+
+
+def unavailable_reason(worker_class):
+    package = WORKER_CLASS_PACKAGES.get(worker_class)
+    if package and importlib.util.find_spec(package) is None:
+        return f'{package} is not installed'
+    return None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def app_env(tmdb_url, database_url, stats_dir):
+    env = dict(os.environ)
+    env.update({
+        'TMDB_BASE_URL': tmdb_url,
+        'TMDB_API_KEY': env.get('TMDB_API_KEY') or 'loadtest',
+        'DATABASE_URL': database_url,
+        'LOADTEST_STATS_DIR': stats_dir,
+    })
+    return env
+
+
+def init_database(env):
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+class GunicornServer:
+    """One gunicorn master with the given settings, started and stopped around a sweep"""
+
+    def __init__(self, config, env, log_path):
+        self.config = config
+        self.env = env
+        self.log_path = log_path
+        self.port = _free_port()
+        self.process = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self, timeout=60):
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF,
+            '--bind', f'127.0.0.1:{self.port}',
+            '--worker-class', self.config['worker_class'],
+            '--workers', str(self.config['workers']),
+            '--threads', str(self.config['threads']),
+            '--timeout', '120',
+            'main:app',
+        ]
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(command, cwd=ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {self.process.returncode}; see {self.log_path}')
+            try:
+                requests.get(self.url + '/', timeout=2)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'gunicorn did not start within {timeout}s; see {self.log_path}')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.process:
+            self.log.close()
+
+
+def sweep_configuration(config, tmdb_url, database_url, user_steps, step_duration, think_time,
+                        p99_slo_ms, max_error_rate, log_dir):
+    """Run every load step against one configuration, stopping early once it has saturated"""
+    stats_dir = tempfile.mkdtemp(prefix='loadtest-pool-')
+    env = app_env(tmdb_url, database_url, stats_dir)
+    name = f"{config['worker_class']}-w{config['workers']}-t{config['threads']}"
+    server = GunicornServer(config, env, os.path.join(log_dir, f'gunicorn-{name}.log'))
+
+    steps = []
+    settings = {}
+    try:
+        server.start()
+        # One short warm-up so worker boot and first-touch caches aren't measured
+        run_step(server.url, tmdb_url, stats_dir, users=1, duration=min(5, step_duration), think_time=0)
+        for users in user_steps:
+            result = run_step(server.url, tmdb_url, stats_dir, users, step_duration, think_time)
+            steps.append(result)
+            print(f"  {name} users={users}: {result['rps']:.1f} req/s, "
+                  f"recommendation p99={_ms(result['key_p99_ms'])}, errors={result['error_rate']:.1%}")
+            if (result['key_p99_ms'] or 0) > p99_slo_ms * 4 or result['error_rate'] > max_error_rate * 5:
+                # Well past saturation; higher steps would only measure timeouts
+                break
+        settings = read_pool_stats(stats_dir)['settings']
+    finally:
+        server.stop()
+        shutil.rmtree(stats_dir, ignore_errors=True)
+
+    return {'name': name, 'config': config, 'pool_settings': settings, 'steps': steps}
+
+
+def _ms(value):
+    return f'{value:.0f}ms' if value is not None else '-'
@@ -1 +1,11 @@
-from app import app
+from app import create_app
+from extensions import db
+
+# The one app instance; gunicorn (main:app) and `flask --app main` load it from here
+app = create_app()
+
+if __name__ == '__main__':
+    # Local development convenience; deployments run init-db out-of-band
+    with app.app_context():
+        db.create_all()
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,4 +1,4 @@
-from app import db
+from extensions import db
 from datetime import datetime
 
 class User(db.Model):
@@ -10,6 +10,9 @@ class User(db.Model):
     user_movies = db.relationship('UserMovie', backref='user', lazy=True, cascade='all, delete-orphan')
     recommendations = db.relationship('Recommendation', backref='user', lazy=True, cascade='all, delete-orphan')
     watchlist = db.relationship('Watchlist', backref='user', lazy=True, cascade='all, delete-orphan')
+    seen_set = db.relationship('SeenSet', backref='user', uselist=False, lazy=True, cascade='all, delete-orphan')
+    slate = db.relationship('RecommendationSlate', backref='user', uselist=False, lazy=True, cascade='all, delete-orphan')
+    import_jobs = db.relationship('ImportJob', backref='user', lazy=True, cascade='all, delete-orphan')
 
 class UserMovie(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -36,6 +39,35 @@ class Recommendation(db.Model):
     recommended_at = db.Column(db.DateTime, default=datetime.utcnow)
     was_liked = db.Column(db.Boolean, default=None)  # User feedback: True=liked, False=disliked, None=no feedback
 
+class SeenSet(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False)
+    bits = db.Column(db.LargeBinary, nullable=False)  # Bloom filter over recommended tmdb_ids
+    capacity = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RecommendationSlate(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False)
+    profile_version = db.Column(db.String(32), nullable=False)  # Hash of the input movies and feedback it was ranked for
+    movies = db.Column(db.JSON, nullable=False)  # Input movies, so the slate can be recomputed offline
+    slate = db.Column(db.JSON, nullable=False)  # Ranked candidates, best first, with only the fields the client shows
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ImportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    target = db.Column(db.String(20), nullable=False)  # favorites or watchlist
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done or failed
+    total = db.Column(db.Integer, nullable=False, default=0)  # TMDB lookups to make
+    resolved = db.Column(db.Integer, nullable=False, default=0)  # Lookups finished so far
+    result = db.Column(db.JSON)  # Imported/skipped counts and unresolved/failed titles once done
+    error = db.Column(db.Text)
+    retry_after = db.Column(db.Integer)  # Seconds to wait before retrying a job TMDB was unavailable for
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Watchlist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
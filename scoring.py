@@ -0,0 +1,180 @@
+import heapq
+import math
+
+from content_filter import filter_safe
+from genres import GENRE_TONES
+
+# Quick tone inference from overview text
+TONE_PATTERNS = {
+    'dark': ['dark', 'brutal', 'violent', 'murder', 'death', 'crime', 'war', 'horror'],
+    'uplifting': ['hope', 'inspiring', 'triumph', 'success', 'love', 'family', 'friendship'],
+    'thrilling': ['action', 'chase', 'escape', 'fight', 'mission', 'adventure', 'suspense'],
+    'comedic': ['funny', 'comedy', 'laugh', 'humor', 'hilarious', 'romantic comedy'],
+    'dramatic': ['emotional', 'drama', 'life', 'story', 'relationship', 'struggle'],
+    'romantic': ['love', 'romance', 'relationship', 'wedding', 'couple', 'heart']
+}
+
+def get_cached_tone_analysis(movie_id, title, overview, genres):
+    """Fast tonal analysis using cached patterns and genre inference"""
+    # Skip API calls for speed - use overview and genre-based inference
+    tone_scores = {}
+    
+    # Quick tone inference from overview text
+    overview_lower = (overview or '').lower()
+    title_lower = (title or '').lower()
+    
+    # Score based on genres (fast)
+    for genre_id in genres:
+        if genre_id in GENRE_TONES:
+            tone = GENRE_TONES[genre_id]
+            tone_scores[tone] = tone_scores.get(tone, 0) + 2
+    
+    # Quick text analysis (limited to avoid slowdown)
+    for tone, patterns in TONE_PATTERNS.items():
+        for pattern in patterns[:3]:  # Only check top 3 patterns per tone
+            if pattern in overview_lower or pattern in title_lower:
+                tone_scores[tone] = tone_scores.get(tone, 0) + 1
+                break  # Stop after first match per tone
+    
+    return tone_scores
+
+def infer_user_tone_profile(user_movies):
+    """Fast inference of user's tonal preferences using genre patterns"""
+    user_tone_profile = {}
+    
+    # Analyze user movies quickly
+    for movie in user_movies:
+        movie_genres = movie.get('genre_ids', [])
+        
+        # Quick tone scoring based on genres only
+        for genre_id in movie_genres:
+            if genre_id in GENRE_TONES:
+                tone = GENRE_TONES[genre_id]
+                user_tone_profile[tone] = user_tone_profile.get(tone, 0) + 1
+        
+        # Bonus for genre combinations (no API calls)
+        genre_set = set(movie_genres)
+        if 18 in genre_set and 36 in genre_set:  # Drama + History
+            user_tone_profile['uplifting'] = user_tone_profile.get('uplifting', 0) + 1
+        if 28 in genre_set and 53 in genre_set:  # Action + Thriller
+            user_tone_profile['thrilling'] = user_tone_profile.get('thrilling', 0) + 1
+        if 80 in genre_set and 53 in genre_set:  # Crime + Thriller
+            user_tone_profile['dark'] = user_tone_profile.get('dark', 0) + 2
+    
+    return user_tone_profile
+
+def build_profile(user_movies, feedback, collaborative_candidates):
+    """
+    Precompute everything candidate scoring needs from the user's side
+
+    The profile is plain data so it can be shipped to scoring workers.
+    """
+    # 1. Enhanced Genre Matching - frequency vector with 10 points per match
+    genre_frequency = {}
+    for movie in user_movies:
+        for genre_id in movie.get('genre_ids', []):
+            genre_frequency[genre_id] = genre_frequency.get(genre_id, 0) + 1
+    
+    # 2. User Feedback Learning
+    liked_genres = set()
+    disliked_genres = set()
+    
+    for entry in feedback:
+        if entry.get('genres') and entry.get('liked') is not None:
+            genre_ids = [g['id'] for g in entry['genres'] if isinstance(g, dict) and 'id' in g]
+            if entry['liked']:
+                liked_genres.update(genre_ids)
+            else:
+                disliked_genres.update(genre_ids)
+    
+    # Liked genres override disliked
+    disliked_genres = disliked_genres - liked_genres
+    
+    return {
+        'genre_frequency': genre_frequency,
+        'liked_genres': liked_genres,
+        'disliked_genres': disliked_genres,
+        # 3. Collaborative Filtering Approximation
+        'collaborative_candidates': set(collaborative_candidates),
+        # 4. Emotional/Tonal Matching
+        'user_tone_profile': infer_user_tone_profile(user_movies),
+        'num_user_movies': len(user_movies)
+    }
+
+def score_candidate(profile, candidate):
+    """Weighted score for a single candidate against a user profile"""
+    genre_frequency = profile['genre_frequency']
+    liked_genres = profile['liked_genres']
+    disliked_genres = profile['disliked_genres']
+    
+    score = 0
+    candidate_genres = set(candidate.get('genre_ids', []))
+    
+    # Enhanced Genre Matching (10 points per match, weighted by frequency)
+    for genre_id in candidate_genres:
+        if genre_id in genre_frequency:
+            score += 10 * genre_frequency[genre_id]
+    
+    # User Feedback Learning (+12/-8 per genre)
+    for genre_id in candidate_genres:
+        if genre_id in liked_genres:
+            score += 12
+        elif genre_id in disliked_genres:
+            score -= 8
+    
+    # Enhanced Rating Quality
+    rating = candidate.get('vote_average', 0)
+    vote_count = candidate.get('vote_count', 0)
+    
+    if rating >= 8.0:
+        score += 10
+    elif rating >= 7.5:
+        score += 6
+    elif rating >= 7.0:
+        score += 2
+    elif rating < 6.0:
+        score -= 10
+    
+    # Social proof bonus
+    if vote_count >= 1000:
+        score += 2
+    
+    # Alternative: vote_average * log(vote_count + 1) bonus
+    if vote_count > 0:
+        score += min(5, rating * math.log(vote_count + 1) / 10)  # Capped at 5 points
+    
+    # Enhanced Popularity Decay
+    popularity = candidate.get('popularity', 0)
+    if 20 <= popularity <= 150:
+        score += 8
+    elif popularity > 300:
+        score -= 2
+    elif popularity < 10 and score < 20:  # Deprioritize low popularity unless strong score
+        score *= 0.8
+    
+    # Collaborative Filtering Bonus
+    if candidate.get('id') in profile['collaborative_candidates']:
+        score += 10
+    
+    # Fast Emotional/Tonal Matching (no API calls)
+    candidate_tone_scores = get_cached_tone_analysis(
+        candidate.get('id', 0),
+        candidate.get('title', ''),
+        candidate.get('overview', ''),
+        candidate_genres
+    )
+    
+    for tone, user_strength in profile['user_tone_profile'].items():
+        if user_strength > 0 and tone in candidate_tone_scores:
+            tone_bonus = min(10, candidate_tone_scores[tone] * 3 * (user_strength / profile['num_user_movies']))
+            score += tone_bonus
+    
+    return max(0, score)
+
+def rank_candidates(profile, candidates, k=5):
+    """Score candidates and return the top k, highest first"""
+    # Content Safety Filter
+    safe = filter_safe(candidates)
+    # Index breaks ties in input order, matching a stable sort
+    top = heapq.nlargest(k, ((score_candidate(profile, c), -index) for index, c in enumerate(safe)))
+    return [safe[-neg_index] for score, neg_index in top]
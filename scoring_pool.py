@@ -0,0 +1,79 @@
+import atexit
+import concurrent.futures
+import heapq
+import multiprocessing
+import os
+
+from content_filter import filter_safe
+from scoring import rank_candidates, score_candidate
+
+# Scoring runs inline unless SCORING_WORKERS is set and the pool is large enough
+SCORING_WORKERS = int(os.environ.get("SCORING_WORKERS", 0))
+SCORING_POOL_MIN_CANDIDATES = int(os.environ.get("SCORING_POOL_MIN_CANDIDATES", 200))
+
+# Only the fields score_candidate reads are sent to workers
+FEATURE_FIELDS = ('id', 'title', 'overview', 'genre_ids', 'vote_average', 'vote_count', 'popularity')
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # A pool inherited across fork is unusable, so each gunicorn worker owns one
+    if _executor is None or _executor_pid != os.getpid():
+        # Spawned workers import only this module and its pure dependencies,
+        # never the Flask app or database state
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=SCORING_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _score_chunk(profile, offset, features, k):
+    """Worker entry point: return the chunk's top k as (score, -index) pairs"""
+    return heapq.nlargest(k, (
+        (score_candidate(profile, movie), -(offset + i)) for i, movie in enumerate(features)
+    ))
+
+
+def rank(profile, candidates, k=5):
+    """
+    Rank candidates against a user profile, fanning out to worker processes
+    for large pools
+
+    Returns:
+        List of the top k candidates, highest score first
+    """
+    safe = filter_safe(candidates)
+    if SCORING_WORKERS <= 0 or len(safe) < SCORING_POOL_MIN_CANDIDATES:
+        return rank_candidates(profile, safe, k)
+
+    features = [{field: movie.get(field) for field in FEATURE_FIELDS if field in movie} for movie in safe]
+    chunk_size = -(-len(features) // SCORING_WORKERS)
+
+    try:
+        executor = _get_executor()
+        futures = [
+            executor.submit(_score_chunk, profile, offset, features[offset:offset + chunk_size], k)
+            for offset in range(0, len(features), chunk_size)
+        ]
+        top = heapq.nlargest(k, (pair for future in futures for pair in future.result()))
+    except concurrent.futures.process.BrokenProcessPool as e:
+        print(f"Scoring pool failed, scoring inline: {e}")
+        shutdown()
+        return rank_candidates(profile, safe, k)
+
+    return [safe[-neg_index] for score, neg_index in top]
+
+
+def shutdown():
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,97 @@
+"""Measure worker startup cost: import time and time-to-first-request
+
+Usage:
+    python scripts/bench_startup.py [--runs 5] [--budget-ms 800]
+
+Each run starts a fresh interpreter, so numbers reflect a cold gunicorn
+worker boot rather than a warm import cache. Exits non-zero when the
+median time-to-first-request exceeds --budget-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter: import the app, then serve one request
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+from main import app
+imported = time.perf_counter()
+with app.test_client() as client:
+    client.get('/')
+served = time.perf_counter()
+print(f"{(imported - start) * 1000:.1f} {(served - start) * 1000:.1f}")
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    # The index page never touches the database, so any URL works here
+    env.setdefault("DATABASE_URL", "sqlite://")
+    return env
+
+
+def import_time_report(top=10):
+    """Run `python -X importtime` and summarise where app import time goes"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+    )
+
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown as two extra spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total_us += int(cumulative)
+        elif depth <= 2:
+            # Direct imports of main and of the app module
+            modules.append((int(cumulative), name.strip()))
+
+    return total_us / 1000, sorted(modules, reverse=True)[:top]
+
+
+def first_request_times(runs):
+    imports, firsts = [], []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", FIRST_REQUEST],
+            cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+        )
+        imported_ms, served_ms = map(float, result.stdout.split()[-2:])
+        imports.append(imported_ms)
+        firsts.append(served_ms)
+    return imports, firsts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if median time-to-first-request exceeds this")
+    args = parser.parse_args()
+
+    total_ms, slowest = import_time_report()
+    print(f"python -X importtime: {total_ms:.1f} ms across top-level imports")
+    for cumulative_us, name in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    imports, firsts = first_request_times(args.runs)
+    print(f"import app (median of {args.runs}): {statistics.median(imports):.1f} ms")
+    print(f"time-to-first-request (median of {args.runs}): {statistics.median(firsts):.1f} ms")
+
+    if args.budget_ms is not None and statistics.median(firsts) > args.budget_ms:
+        print(f"Over budget: {statistics.median(firsts):.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Check read-replica routing against two local SQLite databases
+
+Usage:
+    python scripts/check_replica_routing.py
+
+The "replica" is a second database that nothing replicates into, so it
+behaves like a replica that is arbitrarily far behind. Each check prints
+ok/FAIL; the script exits non-zero if any fail.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+failures = []
+
+
+def check(name, condition):
+    print(f"{'ok  ' if condition else 'FAIL'} {name}")
+    if not condition:
+        failures.append(name)
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix='replica-check-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'primary.db')}"
+    os.environ['DATABASE_REPLICA_URL'] = f"sqlite:///{os.path.join(work_dir, 'replica.db')}"
+    os.environ['WRITE_BUFFER_ENABLED'] = '0'
+    sys.path.insert(0, ROOT)
+
+    import models
+    from app import create_app, get_recent_feedback
+    from database import use_replica
+    from extensions import db
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica'])
+
+    client = app.test_client()
+
+    # A brand-new user is created on the primary and doesn't exist on the replica yet
+    response = client.get('/api/user-history')
+    check('first visit to /api/user-history on a lagging replica', response.status_code == 200)
+    response = client.get('/api/watchlist')
+    check('first visit to /api/watchlist on a lagging replica', response.status_code == 200)
+
+    with app.app_context():
+        user = models.User.query.one()
+        user_id = user.id
+
+        # Writes made inside use_replica() still go to the primary
+        with use_replica():
+            db.session.add(models.Watchlist(user_id=user_id, tmdb_id=550, title='Fight Club'))
+            db.session.add(models.Recommendation(user_id=user_id, tmdb_id=13, title='Forrest Gump',
+                                                 genres=[{'id': 18, 'name': 'Drama'}], was_liked=True))
+            db.session.commit()
+        primary = db.engines[None]
+        replica = db.engines['replica']
+        with primary.connect() as conn:
+            check('writes go to the primary',
+                  conn.execute(models.Watchlist.__table__.select()).first() is not None)
+        with replica.connect() as conn:
+            check('writes do not go to the replica',
+                  conn.execute(models.Watchlist.__table__.select()).first() is None)
+
+        # Expired objects refresh from the primary even inside use_replica()
+        db.session.expire(user)
+        with use_replica():
+            check('expired objects refresh from the primary', user.id == user_id)
+
+        check('feedback lookups read the replica', get_recent_feedback(user) == [])
+
+    response = client.get('/api/watchlist')
+    check('/api/watchlist reads the replica', response.get_json().get('watchlist') == [])
+
+    # "Replicate" the user and their rows, then read again
+    with app.app_context():
+        with primary.connect() as source, replica.begin() as target:
+            for table in (models.User.__table__, models.Watchlist.__table__, models.Recommendation.__table__):
+                rows = [dict(row._mapping) for row in source.execute(table.select())]
+                target.execute(table.insert(), rows)
+        check('feedback lookups see replicated rows', len(get_recent_feedback(models.User.query.one())) == 1)
+
+    response = client.get('/api/watchlist')
+    check('/api/watchlist sees replicated rows', len(response.get_json().get('watchlist', [])) == 1)
+    response = client.get('/api/user-history')
+    check('/api/user-history sees replicated rows', len(response.get_json().get('recommendations', [])) == 1)
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print('All replica routing checks passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Report memory per gunicorn worker and how much copy-on-write saves
+
+Usage:
+    python scripts/memory_report.py <gunicorn master pid>
+
+RSS counts shared pages in full for every process while PSS splits them
+between the processes sharing them, so sum(RSS) - sum(PSS) is the
+memory that preloading avoids duplicating.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_data import memory_report
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after it
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+
+    master_pid = int(sys.argv[1])
+    rows = [('master', master_pid, memory_report(master_pid))]
+    rows += [('worker', pid, memory_report(pid)) for pid in worker_pids(master_pid)]
+
+    print(f"{'role':<8}{'pid':>8}{'rss kB':>12}{'pss kB':>12}{'shared kB':>12}{'private kB':>12}")
+    for role, pid, report in rows:
+        shared = report.get('Shared_Clean', 0) + report.get('Shared_Dirty', 0)
+        private = report.get('Private_Clean', 0) + report.get('Private_Dirty', 0)
+        print(f"{role:<8}{pid:>8}{report.get('Rss', 0):>12}{report.get('Pss', 0):>12}{shared:>12}{private:>12}")
+
+    total_rss = sum(report.get('Rss', 0) for _, _, report in rows)
+    total_pss = sum(report.get('Pss', 0) for _, _, report in rows)
+    print(f"\ntotal rss {total_rss} kB, total pss {total_pss} kB, "
+          f"shared via copy-on-write {total_rss - total_pss} kB")
+
+
+if __name__ == '__main__':
+    main()
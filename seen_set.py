@@ -0,0 +1,100 @@
+import hashlib
+import math
+
+import models
+from write_buffer import write_buffer
+
+# Sized so a user's first thousand recommendations stay under 1% false positives
+DEFAULT_CAPACITY = 1000
+FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over integer tmdb_ids, backed by a bytearray"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, bits=None, count=0):
+        self.capacity = capacity
+        self.num_bits = max(64, int(-capacity * math.log(FALSE_POSITIVE_RATE) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        size = (self.num_bits + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(size)
+        if len(self.bits) != size:
+            raise ValueError("Bloom filter data does not match its capacity")
+        self.count = count
+
+    def _positions(self, tmdb_id):
+        # Double hashing: k positions derived from two 64-bit halves of one digest
+        digest = hashlib.blake2b(int(tmdb_id).to_bytes(8, 'little', signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, tmdb_id):
+        for pos in self._positions(tmdb_id):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, tmdb_id):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(tmdb_id))
+
+    def update(self, other):
+        """Add every member of a filter of the same size"""
+        if other.num_bits != self.num_bits:
+            raise ValueError("Only Bloom filters of the same size can be merged")
+        for index, byte in enumerate(other.bits):
+            self.bits[index] |= byte
+        # The union holds at least as many movies as either side
+        self.count = max(self.count, other.count, self.estimated_count())
+
+    def estimated_count(self):
+        """Estimate how many distinct ids were added from the share of bits set"""
+        ones = sum(bin(byte).count('1') for byte in self.bits)
+        if ones >= self.num_bits:
+            return self.capacity
+        return round(-self.num_bits / self.num_hashes * math.log(1 - ones / self.num_bits))
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+
+def _rebuild(user_id, capacity):
+    """Build a filter from the user's recommendation history"""
+    tmdb_ids = {row.tmdb_id for row in models.Recommendation.query.with_entities(
+        models.Recommendation.tmdb_id
+    ).filter_by(user_id=user_id).distinct()}
+    # Recommendations still waiting in the write buffer count as seen too
+    tmdb_ids.update(write_buffer.pending_recommendation_ids(user_id))
+
+    while capacity < len(tmdb_ids) * 2:
+        capacity *= 2
+
+    seen = BloomFilter(capacity)
+    for tmdb_id in tmdb_ids:
+        seen.add(tmdb_id)
+    return seen
+
+
+def load_seen_set(user_id):
+    """Load a user's seen-set, preferring writes that haven't been flushed yet"""
+    row = write_buffer.pending_seen_set(user_id)
+    if row is None:
+        record = models.SeenSet.query.filter_by(user_id=user_id).first()
+        if record:
+            row = {'bits': record.bits, 'capacity': record.capacity, 'count': record.count}
+
+    if row is None:
+        # First use for this user: seed from recommendations shown before the seen-set existed
+        return _rebuild(user_id, DEFAULT_CAPACITY)
+
+    seen = BloomFilter(row['capacity'], row['bits'], row['count'])
+    if seen.is_full:
+        # Grow rather than let the false positive rate climb
+        return _rebuild(user_id, seen.capacity * 2)
+    return seen
+
+
+def mark_seen(user_id, seen, tmdb_id):
+    """Add a movie to the seen-set and queue the updated filter for writing"""
+    seen.add(tmdb_id)
+    write_buffer.save_seen_set(user_id, bytes(seen.bits), seen.capacity, seen.count, tmdb_id)
@@ -0,0 +1,113 @@
+import array
+import bisect
+import gc
+import threading
+
+import models
+from extensions import db
+from genres import GENRE_SNAPSHOT
+
+_lock = threading.Lock()
+_loaders = {}
+_loaded = {}
+
+
+class GenreTable:
+    """
+    Immutable genre id -> name map packed into flat arrays
+
+    Names live in one bytes blob addressed by an offsets array instead of
+    per-genre str objects, so lookups in forked workers don't write
+    refcounts into pages shared with the gunicorn master.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = array.array('i', (tmdb_id for tmdb_id, name in rows))
+        self.offsets = array.array('I', [0])
+        encoded = []
+        for tmdb_id, name in rows:
+            encoded.append(name.encode('utf-8'))
+            self.offsets.append(self.offsets[-1] + len(encoded[-1]))
+        self.names = b''.join(encoded)
+
+    def _index(self, tmdb_id):
+        index = bisect.bisect_left(self.ids, tmdb_id)
+        if index < len(self.ids) and self.ids[index] == tmdb_id:
+            return index
+        return None
+
+    def name(self, tmdb_id, default=None):
+        index = self._index(tmdb_id)
+        if index is None:
+            return default
+        return self.names[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def __contains__(self, tmdb_id):
+        return self._index(tmdb_id) is not None
+
+
+def register(name, loader):
+    """Register a loader for a read-only structure; it runs once per process"""
+    _loaders[name] = loader
+
+
+def get(name):
+    """Return a shared structure, loading it now if it wasn't preloaded"""
+    data = _loaded.get(name)
+    if data is None:
+        with _lock:
+            data = _loaded.get(name)
+            if data is None:
+                data = _loaded[name] = _loaders[name]()
+    return data
+
+
+def reload(name):
+    """Drop a structure so the next get() loads it again"""
+    with _lock:
+        _loaded.pop(name, None)
+
+
+def preload(app):
+    """
+    Load every registered structure in the gunicorn master before fork
+
+    Objects that exist at this point are moved to the GC's permanent
+    generation so collections in workers don't touch (and copy) them.
+    """
+    with app.app_context():
+        for name in list(_loaders):
+            get(name)
+        # Connections must not be shared across fork
+        db.engine.dispose()
+    gc.freeze()
+
+
+def memory_report(pid='self'):
+    """Per-process memory breakdown in kB from /proc/<pid>/smaps_rollup"""
+    fields = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+    report = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    report[key] = int(value.split()[0])
+    except OSError:
+        return {}
+    return report
+
+
+def format_memory_report(report):
+    if not report:
+        return 'unavailable'
+    shared = report.get('Shared_Clean', 0) + report.get('Shared_Dirty', 0)
+    private = report.get('Private_Clean', 0) + report.get('Private_Dirty', 0)
+    return (f"rss={report.get('Rss', 0)}kB pss={report.get('Pss', 0)}kB "
+            f"shared={shared}kB private={private}kB")
+
+
+register('genres', lambda: GenreTable(
+    [(genre.tmdb_id, genre.name) for genre in models.Genre.query.all()] or GENRE_SNAPSHOT
+))
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+import models
+from extensions import db
+from write_buffer import write_buffer
+
+# Ranked candidates kept per user; picks are drawn from the best few unseen ones
+SLATE_SIZE = int(os.environ.get("SLATE_SIZE", 20))
+SLATE_MIN_REMAINING = 3
+
+# Background refresh: users with a recommendation in the last
+# SLATE_ACTIVE_HOURS are refreshed once they've used their slate, or when
+# it is older than SLATE_MAX_AGE_HOURS
+SLATE_ACTIVE_HOURS = float(os.environ.get("SLATE_ACTIVE_HOURS", 24))
+SLATE_MAX_AGE_HOURS = float(os.environ.get("SLATE_MAX_AGE_HOURS", 6))
+SLATE_REFRESH_BATCH = int(os.environ.get("SLATE_REFRESH_BATCH", 100))
+
+# Only what the client renders and the candidate filter checks is stored
+SLATE_FIELDS = ('id', 'title', 'release_date', 'poster_path', 'overview', 'vote_average', 'genre_ids')
+
+
+def compact(movie):
+    return {field: movie.get(field) for field in SLATE_FIELDS}
+
+
+def profile_version(user_movies, feedback):
+    """
+    Stamp for the inputs a slate was ranked from
+
+    Changes whenever the user's input movies or recent feedback change, so
+    a slate is only served for the profile it was computed for.
+    """
+    key = json.dumps([
+        sorted(movie.get('id') or 0 for movie in user_movies),
+        [[sorted(genre['id'] for genre in entry['genres']), entry['liked']] for entry in feedback]
+    ])
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def load_slate(user_id):
+    """Load a user's slate, preferring one that hasn't been flushed yet"""
+    row = write_buffer.pending_slate(user_id)
+    if row is not None:
+        return row
+    record = models.RecommendationSlate.query.filter_by(user_id=user_id).first()
+    if record:
+        return {'profile_version': record.profile_version, 'movies': record.movies, 'slate': record.slate}
+    return None
+
+
+def pick_from_slate(slate, version, accept):
+    """
+    Pick a recommendation from a precomputed slate
+
+    Returns None when there is no slate, it was ranked for a different
+    profile, or too few of its movies pass `accept` (e.g. already seen).
+    """
+    if not slate or slate['profile_version'] != version:
+        return None
+    remaining = [movie for movie in slate['slate'] if accept(movie)]
+    if len(remaining) < SLATE_MIN_REMAINING:
+        return None
+    # Same variety rule as the online path: one of the top 3
+    return random.choice(remaining[:3])
+
+
+def save_slate(user_id, version, user_movies, ranked):
+    """Queue a ranked list of candidates as the user's slate"""
+    write_buffer.save_slate(
+        user_id,
+        version,
+        [compact(movie) for movie in user_movies],
+        [compact(movie) for movie in ranked[:SLATE_SIZE]]
+    )
+
+
+def slates_to_refresh(limit=None):
+    """Slates of recently active users that have been used since, or have aged out"""
+    now = datetime.utcnow()
+    last_recommended = db.session.query(
+        models.Recommendation.user_id,
+        func.max(models.Recommendation.recommended_at).label('last_recommended_at')
+    ).filter(
+        models.Recommendation.recommended_at >= now - timedelta(hours=SLATE_ACTIVE_HOURS)
+    ).group_by(models.Recommendation.user_id).subquery()
+
+    return models.RecommendationSlate.query.join(
+        last_recommended, last_recommended.c.user_id == models.RecommendationSlate.user_id
+    ).filter(
+        (last_recommended.c.last_recommended_at > models.RecommendationSlate.computed_at) |
+        (models.RecommendationSlate.computed_at < now - timedelta(hours=SLATE_MAX_AGE_HOURS))
+    ).order_by(
+        last_recommended.c.last_recommended_at.desc()
+    ).limit(limit or SLATE_REFRESH_BATCH).all()
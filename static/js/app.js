@@ -2,7 +2,6 @@ class MovieRecommendationApp {
     constructor() {
         this.imageBaseURL = 'https://image.tmdb.org/t/p/w500';
         this.userMovies = [];
-        this.recommendedMovieIds = new Set();
         this.currentRecommendation = null;
         this.suggestionTimeouts = new Map();
         
@@ -101,8 +100,6 @@ class MovieRecommendationApp {
                 const movie = await this.searchMovie(title);
                 if (movie) {
                     this.userMovies.push(movie);
-                    // Add user's movie IDs to the recommended set to avoid recommending them
-                    this.recommendedMovieIds.add(movie.id);
                 }
             }
 
@@ -156,12 +153,18 @@ class MovieRecommendationApp {
 
     async getRecommendation() {
         try {
-            const excludedIds = Array.from(this.recommendedMovieIds);
+            // The server remembers everything it has shown this user, so only
+            // the current pick is sent in case its write hasn't landed yet
+            const excludedIds = this.currentRecommendation ? [this.currentRecommendation.id] : [];
             
-            const response = await fetch('/api/get-recommendation', {
+            // Feedback buttons stay inactive until the final pick arrives
+            this.currentRecommendation = null;
+            
+            const response = await fetch('/api/get-recommendation/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream',
                 },
                 body: JSON.stringify({ 
                     movies: this.userMovies,
@@ -169,16 +172,34 @@ class MovieRecommendationApp {
                 })
             });
 
-            const data = await response.json();
-            
             if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
                 throw new Error(data.error || `API request failed: ${response.status}`);
             }
 
-            // Add to recommended set to avoid future duplicates
-            this.recommendedMovieIds.add(data.recommendation.id);
+            // Provisional picks are rendered as they stream in; this resolves
+            // with the final pick while details keep streaming behind it
+            let resolveDetails;
+            const details = new Promise(resolve => { resolveDetails = resolve; });
+            
+            const recommendation = await new Promise((resolve, reject) => {
+                this.readEvents(response.body, (event, data) => {
+                    if (event === 'pick' && data.final) {
+                        resolve(data.recommendation);
+                    } else if (event === 'pick') {
+                        this.showProvisionalRecommendation(data.recommendation);
+                    } else if (event === 'details') {
+                        resolveDetails(data.movie);
+                    } else if (event === 'error' || event === 'unavailable') {
+                        reject(new Error(data.error));
+                    }
+                }).then(() => resolve(null), reject).finally(() => resolveDetails(null));
+            });
 
-            return data.recommendation;
+            if (recommendation) {
+                this.pendingDetails = { id: recommendation.id, promise: details };
+            }
+            return recommendation;
 
         } catch (error) {
             console.error('Error getting recommendation:', error);
@@ -186,6 +207,45 @@ class MovieRecommendationApp {
         }
     }
 
+    async readEvents(body, onEvent) {
+        // Minimal Server-Sent Events parser over a fetch() body stream
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const message = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                message.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                onEvent(event, data ? JSON.parse(data) : {});
+            }
+        }
+    }
+
+    showProvisionalRecommendation(movie) {
+        // Show the best pick so far while slower sources are still scoring
+        this.renderMovie(movie);
+        this.movieGenres.innerHTML = '';
+        this.resetFeedbackButtons();
+        this.addToWatchlistBtn.classList.add('d-none');
+        this.showLoading(false);
+        if (this.recommendationCard.classList.contains('d-none')) {
+            this.showRecommendation();
+        }
+    }
+
     async getAnotherRecommendation() {
         if (this.userMovies.length === 0) {
             this.showError('Please select your favorite movies first.');
@@ -213,43 +273,8 @@ class MovieRecommendationApp {
         try {
             this.currentRecommendation = movie;
             
-            // Get detailed movie information including genres
-            const detailedMovie = await this.getMovieDetails(movie.id);
-            
-            this.movieTitle.textContent = movie.title;
-            this.movieYear.textContent = movie.release_date ? new Date(movie.release_date).getFullYear() : 'Unknown';
-            this.movieRating.textContent = `★ ${movie.vote_average.toFixed(1)}/10`;
-            this.movieOverview.textContent = movie.overview || 'No overview available.';
-
-            // Set poster image with error handling
-            if (movie.poster_path) {
-                const posterUrl = `${this.imageBaseURL}${movie.poster_path}`;
-                this.moviePoster.onload = () => {
-                    this.moviePoster.style.opacity = '1';
-                };
-                this.moviePoster.onerror = () => {
-                    console.warn('Failed to load poster:', posterUrl);
-                    this.moviePoster.src = this.getPlaceholderImage();
-                };
-                this.moviePoster.style.opacity = '0.5';
-                this.moviePoster.src = posterUrl;
-                this.moviePoster.alt = `${movie.title} Poster`;
-            } else {
-                this.moviePoster.src = this.getPlaceholderImage();
-                this.moviePoster.alt = 'No Poster Available';
-                this.moviePoster.style.opacity = '1';
-            }
-
-            // Display genres
-            if (detailedMovie && detailedMovie.genres) {
-                this.movieGenres.innerHTML = '';
-                detailedMovie.genres.forEach(genre => {
-                    const genreBadge = document.createElement('span');
-                    genreBadge.className = 'badge bg-info me-1 mb-1';
-                    genreBadge.textContent = genre.name;
-                    this.movieGenres.appendChild(genreBadge);
-                });
-            }
+            this.renderMovie(movie);
+            this.movieGenres.innerHTML = '';
 
             // Reset all feedback buttons and poster styling
             this.resetFeedbackButtons();
@@ -261,6 +286,23 @@ class MovieRecommendationApp {
             }
 
             this.showRecommendation();
+            this.showLoading(false);
+
+            // Genres fill in once details arrive, from the stream if it carried them
+            const streamed = this.pendingDetails && this.pendingDetails.id === movie.id
+                ? await this.pendingDetails.promise
+                : null;
+            const detailedMovie = streamed || await this.getMovieDetails(movie.id);
+
+            // Display genres
+            if (detailedMovie && detailedMovie.genres && this.currentRecommendation === movie) {
+                detailedMovie.genres.forEach(genre => {
+                    const genreBadge = document.createElement('span');
+                    genreBadge.className = 'badge bg-info me-1 mb-1';
+                    genreBadge.textContent = genre.name;
+                    this.movieGenres.appendChild(genreBadge);
+                });
+            }
 
         } catch (error) {
             console.error('Error displaying recommendation:', error);
@@ -268,6 +310,36 @@ class MovieRecommendationApp {
         }
     }
 
+    renderMovie(movie) {
+        this.movieTitle.textContent = movie.title;
+        this.movieYear.textContent = movie.release_date ? new Date(movie.release_date).getFullYear() : 'Unknown';
+        this.movieRating.textContent = `★ ${movie.vote_average.toFixed(1)}/10`;
+        this.movieOverview.textContent = movie.overview || 'No overview available.';
+
+        // Set poster image with error handling
+        if (movie.poster_path) {
+            const posterUrl = `${this.imageBaseURL}${movie.poster_path}`;
+            if (this.moviePoster.src === posterUrl) {
+                // Already showing (e.g. the final pick matches the provisional one)
+                return;
+            }
+            this.moviePoster.onload = () => {
+                this.moviePoster.style.opacity = '1';
+            };
+            this.moviePoster.onerror = () => {
+                console.warn('Failed to load poster:', posterUrl);
+                this.moviePoster.src = this.getPlaceholderImage();
+            };
+            this.moviePoster.style.opacity = '0.5';
+            this.moviePoster.src = posterUrl;
+            this.moviePoster.alt = `${movie.title} Poster`;
+        } else {
+            this.moviePoster.src = this.getPlaceholderImage();
+            this.moviePoster.alt = 'No Poster Available';
+            this.moviePoster.style.opacity = '1';
+        }
+    }
+
     async getMovieDetails(movieId) {
         try {
             const response = await fetch(`/api/movie-details/${movieId}`);
@@ -291,7 +363,7 @@ class MovieRecommendationApp {
         
         // Reset data
         this.userMovies = [];
-        this.recommendedMovieIds.clear();
+        this.currentRecommendation = null;
         
         // Hide states
         this.hideRecommendation();
@@ -0,0 +1,233 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# TMDB API configuration
+TMDB_API_KEY = os.environ.get("TMDB_API_KEY", "a4747b23774690ec1831568f642ff364")
+TMDB_BASE_URL = os.environ.get("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# One timeout for every call unless a caller has a tighter latency budget
+TMDB_TIMEOUT = float(os.environ.get("TMDB_TIMEOUT", 3.0))
+
+# Outbound calls allowed at once per process, and how long a request may
+# queue for a slot before it is shed with a 503
+TMDB_MAX_CONCURRENCY = int(os.environ.get("TMDB_MAX_CONCURRENCY", 16))
+TMDB_QUEUE_TIMEOUT = float(os.environ.get("TMDB_QUEUE_TIMEOUT", 0.5))
+
+# Consecutive failures that open an endpoint's circuit, and how long it
+# stays open before a single probe is let through
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("TMDB_BREAKER_FAILURES", 5))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("TMDB_BREAKER_RESET", 30.0))
+
+# Seconds a cached response is fresh, by endpoint; stale entries are served
+# while a refresh runs, or when TMDB is failing, for up to CACHE_MAX_STALE
+CACHE_TTL = {
+    '/movie/{id}': 24 * 3600,
+    '/genre/movie/list': 24 * 3600,
+}
+CACHE_DEFAULT_TTL = 3600
+CACHE_MAX_STALE = 7 * 24 * 3600
+MAX_CACHED_RESPONSES = 5000
+
+
+class TMDBError(Exception):
+    """TMDB answered with an error status"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TMDBUnavailable(Exception):
+    """TMDB can't be called right now (circuit open or too many calls in flight)"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed -> open after repeated failures -> half-open probe"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may go out now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probing:
+                # Exactly one caller probes; everyone else keeps failing fast
+                self.probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 1
+        return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+    def release_probe(self):
+        """Hand back a half-open probe slot that was never used"""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=TMDB_MAX_CONCURRENCY))
+_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=TMDB_MAX_CONCURRENCY))
+
+_limiter = threading.BoundedSemaphore(TMDB_MAX_CONCURRENCY)
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+_cache = {}
+_cache_lock = threading.Lock()
+_refreshing = set()
+
+
+def endpoint_for(path):
+    """Collapse ids so /movie/550 and /movie/13 share a breaker and TTL"""
+    return re.sub(r'/\d+', '/{id}', path)
+
+
+def breaker_for(endpoint):
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker()
+        return breaker
+
+
+def _cache_key(path, params):
+    return path, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+
+def _cache_put(key, data):
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHED_RESPONSES:
+            _cache.clear()
+        _cache[key] = (time.monotonic(), data)
+
+
+def _fetch(path, params, timeout):
+    endpoint = endpoint_for(path)
+    breaker = breaker_for(endpoint)
+    if not breaker.allow():
+        raise TMDBUnavailable(f'TMDB {endpoint} is unavailable', breaker.retry_after())
+
+    if not _limiter.acquire(timeout=TMDB_QUEUE_TIMEOUT):
+        # Give an admitted half-open probe back rather than wedging the breaker
+        breaker.release_probe()
+        raise TMDBUnavailable('Too many TMDB requests in flight')
+
+    try:
+        response = _session.get(
+            f"{TMDB_BASE_URL}{path}",
+            params={'api_key': TMDB_API_KEY, **(params or {})},
+            timeout=timeout or TMDB_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure()
+        raise TMDBUnavailable(f'TMDB {endpoint} request failed: {e}', breaker.retry_after())
+    finally:
+        _limiter.release()
+
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+        raise TMDBUnavailable(f'TMDB {endpoint} returned {response.status_code}', breaker.retry_after())
+
+    # Client errors mean TMDB is healthy; they don't count against the breaker
+    if not response.ok:
+        breaker.record_success()
+        raise TMDBError(f'TMDB {endpoint} returned {response.status_code}', response.status_code)
+
+    # A 200 that isn't JSON (e.g. a proxy error page) is an upstream failure
+    try:
+        data = response.json()
+    except ValueError as e:
+        breaker.record_failure()
+        raise TMDBUnavailable(f'TMDB {endpoint} returned invalid JSON: {e}', breaker.retry_after())
+    breaker.record_success()
+    return data
+
+
+def _refresh(key, path, params, timeout):
+    try:
+        _cache_put(key, _fetch(path, params, timeout))
+    except (TMDBError, TMDBUnavailable) as e:
+        print(f"Background TMDB refresh failed: {e}")
+    finally:
+        with _cache_lock:
+            _refreshing.discard(key)
+
+
+def get(path, params=None, timeout=None):
+    """
+    GET a TMDB API path and return the decoded JSON
+
+    Fresh cached responses are returned without a call. Stale ones are
+    returned immediately while a background refresh runs, and are also
+    the fallback when TMDB fails or its circuit is open.
+
+    Raises:
+        TMDBError: TMDB returned a client error (e.g. 401, 404)
+        TMDBUnavailable: TMDB is down or overloaded and nothing is cached
+    """
+    key = _cache_key(path, params)
+    ttl = CACHE_TTL.get(endpoint_for(path), CACHE_DEFAULT_TTL)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached:
+        age = time.monotonic() - cached[0]
+        if age < ttl:
+            return cached[1]
+        if age < CACHE_MAX_STALE:
+            with _cache_lock:
+                start_refresh = key not in _refreshing
+                _refreshing.add(key)
+            if start_refresh:
+                threading.Thread(target=_refresh, args=(key, path, params, timeout), daemon=True).start()
+            return cached[1]
+
+    try:
+        data = _fetch(path, params, timeout)
+    except TMDBUnavailable:
+        if cached:
+            return cached[1]
+        raise
+    _cache_put(key, data)
+    return data
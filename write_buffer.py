@@ -0,0 +1,333 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import case, func, insert, select, tuple_, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+import models
+
+# Flushes a feedback write is retried for while its recommendation may
+# still be sitting in another worker's buffer
+FEEDBACK_MAX_ATTEMPTS = 10
+
+# Consecutive failed flushes before rows are written one at a time and the
+# ones the database rejects are dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class WriteBuffer:
+    """Write-behind buffer for recommendation inserts, feedback updates, seen-sets and slates
+
+    Rows are queued in memory and flushed as multi-row statements by a
+    background thread once `max_rows` are pending or `flush_interval`
+    seconds have passed, whichever comes first. Pending rows are flushed
+    on interpreter shutdown.
+    """
+
+    def __init__(self, max_rows=100, flush_interval=1.0):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.enabled = True
+        self._app = None
+        self._db = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._recommendations = []
+        self._feedback = {}
+        self._feedback_attempts = {}
+        self._failed_flushes = 0
+        self._seen_sets = {}
+        self._seen_added = {}
+        self._slates = {}
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def init_app(self, app, db):
+        # The buffer is process-wide, so a later app replaces the earlier
+        # one but shutdown is only hooked once
+        if self._app is None:
+            atexit.register(self.close)
+        self._app = app
+        self._db = db
+        self.max_rows = int(os.environ.get("WRITE_BUFFER_MAX_ROWS", self.max_rows))
+        self.flush_interval = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", self.flush_interval))
+        self.enabled = os.environ.get("WRITE_BUFFER_ENABLED", "1") != "0"
+
+    def add_recommendation(self, **row):
+        """Queue a Recommendation insert"""
+        row.setdefault('recommended_at', datetime.utcnow())
+        row.setdefault('was_liked', None)
+        with self._lock:
+            self._recommendations.append(row)
+        self._after_enqueue()
+
+    def set_feedback(self, user_id, tmdb_id, liked):
+        """Queue a feedback write for the user's latest recommendation of a movie"""
+        with self._lock:
+            # Repeated feedback for the same movie collapses to the last value
+            self._feedback[(user_id, tmdb_id)] = liked
+        self._after_enqueue()
+
+    def save_seen_set(self, user_id, bits, capacity, count, added_id=None):
+        """Queue a write of a user's seen-set filter, merged into the stored one on flush"""
+        with self._lock:
+            if added_id is not None:
+                self._seen_added.setdefault(user_id, set()).add(added_id)
+            # Each save carries the whole filter, so only the newest one is kept
+            self._seen_sets[user_id] = {'user_id': user_id, 'bits': bits, 'capacity': capacity,
+                                        'count': count, 'updated_at': datetime.utcnow()}
+        self._after_enqueue()
+
+    def pending_seen_set(self, user_id):
+        """Return a seen-set that is queued but not yet written, if any"""
+        with self._lock:
+            return self._seen_sets.get(user_id)
+
+    def save_slate(self, user_id, profile_version, movies, slate):
+        """Queue an upsert of a user's precomputed recommendation slate"""
+        with self._lock:
+            self._slates[user_id] = {'user_id': user_id, 'profile_version': profile_version, 'movies': movies,
+                                     'slate': slate, 'computed_at': datetime.utcnow()}
+        self._after_enqueue()
+
+    def pending_slate(self, user_id):
+        """Return a slate that is queued but not yet written, if any"""
+        with self._lock:
+            return self._slates.get(user_id)
+
+    def pending_recommendation_ids(self, user_id):
+        """tmdb_ids of this user's recommendations that are queued but not yet written"""
+        with self._lock:
+            return [row['tmdb_id'] for row in self._recommendations if row['user_id'] == user_id]
+
+    def pending(self):
+        with self._lock:
+            return len(self._recommendations) + len(self._feedback) + len(self._seen_sets) + len(self._slates)
+
+    def _after_enqueue(self):
+        if not self.enabled:
+            self.flush()
+            return
+        self._ensure_thread()
+        if self.pending() >= self.max_rows:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write buffer flush failed: {e}")
+
+    def flush(self):
+        """Write all pending rows in a single transaction"""
+        with self._lock:
+            recommendations, self._recommendations = self._recommendations, []
+            feedback, self._feedback = self._feedback, {}
+            # Left visible to pending_seen_set() / pending_slate() until written
+            seen_sets = dict(self._seen_sets)
+            slates = dict(self._slates)
+
+        if not recommendations and not feedback and not seen_sets and not slates:
+            return
+
+        try:
+            unmatched = self._write(recommendations, feedback, seen_sets, slates)
+            self._failed_flushes = 0
+        except Exception as e:
+            self._failed_flushes += 1
+            if self._failed_flushes < MAX_FLUSH_ATTEMPTS:
+                # Requeue so a transient database error doesn't lose writes
+                self._requeue(recommendations, feedback)
+                raise
+            # The batch keeps failing, most likely because of one bad row;
+            # write rows one at a time so the rest aren't held back by it
+            print(f"Write buffer flush failed {self._failed_flushes} times, writing rows one at a time: {e}")
+            self._failed_flushes = 0
+            unmatched, seen_sets, slates = self._write_individually(recommendations, feedback, seen_sets, slates)
+
+        with self._lock:
+            self._requeue_unmatched_feedback(feedback, unmatched)
+            for pending, written in ((self._seen_sets, seen_sets), (self._slates, slates)):
+                for user_id, row in written.items():
+                    if pending.get(user_id) is row:
+                        del pending[user_id]
+            for user_id in seen_sets:
+                if user_id not in self._seen_sets:
+                    self._seen_added.pop(user_id, None)
+
+    def _write(self, recommendations, feedback, seen_sets, slates):
+        """Write rows in one transaction; returns feedback that matched no recommendation"""
+        table = models.Recommendation.__table__
+        unmatched = {}
+        with self._app.app_context():
+            with self._db.engine.begin() as conn:
+                if recommendations:
+                    conn.execute(insert(table), recommendations)
+                if feedback:
+                    # Target the most recent recommendation of the movie so
+                    # repeated recommendations don't receive stale feedback
+                    latest = conn.execute(
+                        select(table.c.user_id, table.c.tmdb_id, func.max(table.c.id)).where(
+                            tuple_(table.c.user_id, table.c.tmdb_id).in_(list(feedback))
+                        ).group_by(table.c.user_id, table.c.tmdb_id)
+                    )
+                    latest_ids = {(user_id, tmdb_id): row_id for user_id, tmdb_id, row_id in latest}
+                    unmatched = {key: liked for key, liked in feedback.items() if key not in latest_ids}
+                    if latest_ids:
+                        # One multi-row UPDATE, each row getting its own value
+                        liked_by_id = {row_id: feedback[key] for key, row_id in latest_ids.items()}
+                        conn.execute(
+                            update(table).where(table.c.id.in_(list(liked_by_id))).values(
+                                was_liked=case(liked_by_id, value=table.c.id)
+                            )
+                        )
+                if seen_sets:
+                    self._upsert(conn, models.SeenSet.__table__, self._merge_seen_sets(conn, seen_sets))
+                if slates:
+                    self._upsert(conn, models.RecommendationSlate.__table__, list(slates.values()))
+        return unmatched
+
+    def _write_individually(self, recommendations, feedback, seen_sets, slates):
+        """
+        Write each row in its own transaction
+
+        Rows the database rejects are logged and dropped. Rows that fail
+        because the database can't be reached are requeued.
+
+        Returns:
+            (unmatched feedback, seen-sets and slates no longer pending)
+        """
+        unmatched = {}
+        done_seen_sets = dict(seen_sets)
+        done_slates = dict(slates)
+        batches = [(('recommendation', row), ([row], {}, {}, {})) for row in recommendations]
+        batches += [(('feedback', key, liked), ([], {key: liked}, {}, {})) for key, liked in feedback.items()]
+        batches += [(('seen_set', user_id), ([], {}, {user_id: row}, {})) for user_id, row in seen_sets.items()]
+        batches += [(('slate', user_id), ([], {}, {}, {user_id: row})) for user_id, row in slates.items()]
+
+        for item, batch in batches:
+            try:
+                unmatched.update(self._write(*batch))
+            except (OperationalError, InterfaceError) as e:
+                print(f"Write buffer could not reach the database, requeueing {item[0]}: {e}")
+                if item[0] == 'recommendation':
+                    self._requeue([item[1]], {})
+                elif item[0] == 'feedback':
+                    self._requeue([], {item[1]: item[2]})
+                elif item[0] == 'seen_set':
+                    del done_seen_sets[item[1]]
+                else:
+                    del done_slates[item[1]]
+            except Exception as e:
+                print(f"Write buffer dropped a {item[0]} row the database rejected: {e}")
+        return unmatched, done_seen_sets, done_slates
+
+    def _requeue(self, recommendations, feedback):
+        with self._lock:
+            self._recommendations[:0] = recommendations
+            for key, liked in feedback.items():
+                self._feedback.setdefault(key, liked)
+
+    def _requeue_unmatched_feedback(self, feedback, unmatched):
+        # Feedback can reach this worker before the worker that made the
+        # recommendation has flushed it, so retry for a few flushes. Called
+        # with the lock held
+        for key in feedback:
+            if key not in unmatched:
+                self._feedback_attempts.pop(key, None)
+        for key, liked in unmatched.items():
+            attempts = self._feedback_attempts.get(key, 0) + 1
+            if attempts >= FEEDBACK_MAX_ATTEMPTS:
+                self._feedback_attempts.pop(key, None)
+                print(f"Dropping feedback for user {key[0]} movie {key[1]}: no recommendation to update")
+                continue
+            self._feedback_attempts[key] = attempts
+            # Newer feedback queued meanwhile wins
+            self._feedback.setdefault(key, liked)
+
+    def _merge_seen_sets(self, conn, seen_sets):
+        """
+        Combine queued seen-sets with the stored ones instead of replacing them
+
+        Every worker saves the whole filter, so a plain upsert would drop
+        movies another worker marked after this one loaded the filter.
+        Filters of the same size are ORed together. When the stored filter
+        has been grown elsewhere, the movies this worker added are inserted
+        into it. A queued filter larger than the stored one was rebuilt from
+        the full history and wins.
+        """
+        from seen_set import BloomFilter
+
+        table = models.SeenSet.__table__
+        query = select(table.c.user_id, table.c.bits, table.c.capacity, table.c.count).where(
+            table.c.user_id.in_(list(seen_sets))
+        )
+        if conn.dialect.name == 'postgresql':
+            query = query.with_for_update()
+        stored = {row.user_id: row for row in conn.execute(query)}
+        with self._lock:
+            added = {user_id: set(ids) for user_id, ids in self._seen_added.items() if user_id in seen_sets}
+
+        rows = []
+        for user_id, row in seen_sets.items():
+            current = stored.get(user_id)
+            if current is None or current.capacity < row['capacity']:
+                rows.append(row)
+                continue
+            seen = BloomFilter(current.capacity, current.bits, current.count)
+            if current.capacity == row['capacity']:
+                seen.update(BloomFilter(row['capacity'], row['bits'], row['count']))
+            else:
+                for tmdb_id in added.get(user_id, ()):
+                    seen.add(tmdb_id)
+            rows.append({**row, 'bits': bytes(seen.bits), 'capacity': seen.capacity, 'count': seen.count})
+        return rows
+
+    def _upsert(self, conn, table, rows):
+        """Insert or replace per-user rows keyed on the unique user_id column"""
+        dialect = conn.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id],
+                set_={name: stmt.excluded[name] for name in rows[0] if name != 'user_id'}
+            )
+            conn.execute(stmt, rows)
+        else:
+            conn.execute(table.delete().where(table.c.user_id.in_([row['user_id'] for row in rows])))
+            conn.execute(insert(table), rows)
+
+    def close(self):
+        """Stop the flush thread and write out anything still pending"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Write buffer final flush failed: {e}")
+
+
+write_buffer = WriteBuffer()